@@ -0,0 +1,56 @@
+"""
+measures the per request cost of reading the clock in pre-forked workers
+that were forked from within an active :class:`hiro.Timeline`.
+
+usage: PYTHONPATH=. python benchmarks/prefork.py [workers] [requests]
+"""
+import datetime
+import os
+import sys
+import time
+
+import hiro
+
+
+def handle_requests(count):
+    start = time.perf_counter()
+
+    for _ in range(count):
+        time.time()
+        datetime.datetime.now()
+
+    return (time.perf_counter() - start) / count * 1e9
+
+
+def run_workers(workers, count):
+    results = []
+
+    for _ in range(workers):
+        read, write = os.pipe()
+        pid = os.fork()
+
+        if pid == 0:
+            os.close(read)
+            os.write(write, str(handle_requests(count)).encode())
+            os._exit(0)
+        os.close(write)
+        with os.fdopen(read) as result:
+            results.append(float(result.read()))
+        os.waitpid(pid, 0)
+
+    return sum(results) / len(results)
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    print("no timeline:          %8.1f ns/request" % run_workers(workers, count))
+
+    for policy in hiro.core.FORK_POLICIES:
+        with hiro.Timeline(scale=10, on_fork=policy):
+            cost = run_workers(workers, count)
+        print("on_fork=%-8s      %8.1f ns/request" % (repr(policy), cost))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,37 @@ time manipulation utilities for python
 """
 
 from . import _version
-from .core import Timeline, run_async, run_sync, run_threaded
+from .core import (
+    Timeline,
+    TimelineExecutor,
+    TimelineProcessExecutor,
+    run_async,
+    run_batch,
+    run_coroutine,
+    run_gather,
+    run_process,
+    run_stream,
+    run_sync,
+    run_threaded,
+)
+from .measurement import measure, sweep
+from .shared import SharedTimeline
 
-__all__ = ["run_threaded", "run_async", "run_sync", "Timeline"]
+__all__ = [
+    "run_threaded",
+    "run_async",
+    "run_sync",
+    "run_batch",
+    "run_process",
+    "run_coroutine",
+    "run_gather",
+    "run_stream",
+    "measure",
+    "sweep",
+    "Timeline",
+    "TimelineExecutor",
+    "TimelineProcessExecutor",
+    "SharedTimeline",
+]
 
 __version__ = _version.get_versions()["version"]
@@ -0,0 +1,38 @@
+"""
+bootstrap used by :mod:`hiro.propagation` to start a timeline in python
+subprocesses before any user code is imported.
+"""
+import importlib.machinery
+import importlib.util
+import os
+import sys
+
+
+def _bootstrap():
+    here = os.path.dirname(os.path.abspath(__file__))
+    root = os.path.dirname(os.path.dirname(here))
+    paths = [path for path in sys.path if os.path.abspath(path or ".") != here]
+
+    # chain to any sitecustomize module that this one shadowed. It is loaded
+    # under a different name since importlib still owns this module's entry
+    # in sys.modules while it is being executed.
+    spec = importlib.machinery.PathFinder.find_spec(__name__, paths)
+
+    if spec is not None and spec.loader is not None:
+        spec = importlib.util.spec_from_file_location(
+            "_hiro_shadowed_sitecustomize", spec.origin
+        )
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+
+    # import the copy of hiro that this bootstrap belongs to
+    sys.path.insert(0, root)
+    try:
+        from hiro.propagation import process_startup
+    finally:
+        sys.path.remove(root)
+    process_startup()
+
+
+_bootstrap()
@@ -1,58 +1,304 @@
 """
 timeline & runner implementation
 """
+import asyncio
+import collections
+import concurrent.futures
 import copy
 import datetime
 import inspect
+import itertools
+import os
+import pickle
+import sched
+import selectors
 import sys
 import threading
 import time
-from functools import wraps
-from unittest import mock
-
-from .errors import SegmentNotComplete, TimeOutofBounds
+import types
+import unittest
+import weakref
+from functools import partial, wraps
+
+from . import propagation
+from .counters import TimelineCounters
+from .detector import UnpatchedClockDetector
+from .errors import BranchError, SegmentNotComplete, TimeOutofBounds
 from .patches import Date, Datetime
-from .utils import chained, time_in_seconds, timedelta_to_seconds
+from .rules import DEFAULT, EXCLUDED, IgnoredModules, ModuleRules
+from .sampling import CallSiteSampler
+from .tracing import TimelineTracer
+from .utils import chained, minimum_sleep, time_in_seconds, timedelta_to_seconds
+
+#: modules that are never scanned or patched (see
+#: :class:`hiro.rules.IgnoredModules`)
+IGNORED_MODULES = IgnoredModules()
+#: timelines that are currently entered in this process
+_ACTIVE_TIMELINES = weakref.WeakSet()
+FORK_POLICIES = ("keep", "rebase", "detach")
+
+
+def _after_fork_in_child():
+    """
+    applies the :paramref:`Timeline.on_fork` policy of every active
+    timeline in a forked child process
+    """
+
+    _PATCHES._after_fork()
+
+    for timeline in list(_ACTIVE_TIMELINES):
+        timeline._after_fork()
 
-IGNORED_MODULES = set()
-_NO_EXCEPTION = (None, None, None)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
 
 
 class Decorator:
+    """
+    allows a context manager to be used as a decorator of functions,
+    coroutine functions, generator functions, asynchronous generator
+    functions and classes.
+
+    Whether the decorated callable accepts a ``timeline`` argument is
+    determined once when it is decorated.
+
+    When used on a class, the context is entered once for the whole class
+    (in ``setup_class`` or ``setUpClass`` for :class:`unittest.TestCase`
+    subclasses) and exited after its last test, instead of once per test
+    method. Test methods accepting a ``timeline`` argument receive it.
+    """
+
     def __call__(self, fn):
-        @wraps(fn)
-        def inner(*args, **kw):
+        if inspect.isclass(fn):
+            return self._decorate_class(fn)
+
+        kwargs = {"timeline": self} if _accepts_timeline(fn) else {}
+
+        if inspect.iscoroutinefunction(fn):
+
+            @wraps(fn)
+            async def inner(*args, **kw):
+                with self:
+                    return await fn(*args, **kwargs, **kw)
+
+        elif inspect.isasyncgenfunction(fn):
+
+            @wraps(fn)
+            async def inner(*args, **kw):
+                with self:
+                    async for item in fn(*args, **kwargs, **kw):
+                        yield item
+
+        elif inspect.isgeneratorfunction(fn):
+
+            @wraps(fn)
+            def inner(*args, **kw):
+                with self:
+                    return (yield from fn(*args, **kwargs, **kw))
+
+        else:
+
+            @wraps(fn)
+            def inner(*args, **kw):
+                with self:
+                    return fn(*args, **kwargs, **kw)
+
+        if kwargs:
+            # keeps test runners from treating the argument as a fixture
+            inner.__signature__ = _signature_without_timeline(fn)
+
+        return inner
+
+    def _decorate_class(self, cls):
+        """
+        enters the context once for all tests of ``cls``
+        """
+        if issubclass(cls, unittest.TestCase):
+            setup_name, teardown_name = "setUpClass", "tearDownClass"
+        else:
+            setup_name, teardown_name = "setup_class", "teardown_class"
+        setup = vars(cls).get(setup_name)
+        teardown = vars(cls).get(teardown_name)
+
+        def _resolve(klass, name, hook):
+            if isinstance(hook, (classmethod, staticmethod)):
+                return hook.__get__(None, klass)
+
+            if hook is not None:
+                return partial(hook, klass)
+
+            return getattr(super(cls, klass), name, None)
+
+        def setup_class(klass):
             self.__enter__()
-            exc = _NO_EXCEPTION
+            hook = _resolve(klass, setup_name, setup)
+
+            if hook is not None:
+                hook()
+
+        def teardown_class(klass):
             try:
-                if "timeline" in inspect.signature(fn).parameters:
-                    result = fn(*args, timeline=self, **kw)
-                else:
-                    result = fn(*args, **kw)
-            except Exception:
-                exc = sys.exc_info()
+                hook = _resolve(klass, teardown_name, teardown)
+
+                if hook is not None:
+                    hook()
+            finally:
+                self.__exit__(None, None, None)
 
-            catch = self.__exit__(*exc)
+        setattr(cls, setup_name, classmethod(setup_class))
+        setattr(cls, teardown_name, classmethod(teardown_class))
 
-            if not catch and exc is not _NO_EXCEPTION:
-                raise exc[0]
+        for name, method in list(vars(cls).items()):
+            if (
+                name.startswith("test")
+                and inspect.isfunction(method)
+                and _accepts_timeline(method)
+            ):
+                setattr(cls, name, self._bind_timeline(method))
 
-            return result
+        return cls
+
+    def _bind_timeline(self, fn):
+        """
+        returns a wrapper of ``fn`` that passes the context as its
+        ``timeline`` argument and hides that argument from its signature
+        """
+
+        @wraps(fn)
+        def inner(*args, **kw):
+            return fn(*args, timeline=self, **kw)
+
+        inner.__signature__ = _signature_without_timeline(fn)
 
         return inner
 
 
+def _site_patcher(target, attribute, replace):
+    """
+    :returns: a patcher that applies ``replace`` to the clocks referred to
+     by a site found by :class:`PatchSites` or ``None`` if the site no
+     longer refers to any clock. Sites that are already patched by another
+     timeline are replaced based on their original value.
+    """
+
+    if attribute is None:
+        func, args, keywords, namespace = _PATCHES.original(
+            target, None, target.__reduce__()[2]
+        )
+        state = (
+            replace(func),
+            tuple(map(replace, args)),
+            {key: replace(value) for key, value in (keywords or {}).items()},
+            namespace,
+        )
+
+        if not _replaced(
+            (func,) + args + tuple((keywords or {}).values()),
+            (state[0],) + state[1] + tuple(state[2].values()),
+        ):
+            return None
+
+        return _Patch(target, None, state)
+    value = _PATCHES.original(target, attribute, getattr(target, attribute, None))
+
+    if attribute == "__defaults__":
+        new = tuple(map(replace, value or ()))
+        replaced = _replaced(value or (), new)
+    elif attribute == "__kwdefaults__":
+        new = {key: replace(item) for key, item in (value or {}).items()}
+        replaced = _replaced((value or {}).values(), new.values())
+    else:
+        new = replace(value)
+        replaced = new is not value
+
+    if not replaced:
+        return None
+
+    return _Patch(target, attribute, new)
+
+
+def _replaced(values, new_values):
+    return any(value is not new for value, new in zip(values, new_values))
+
+
+def _signature_without_timeline(fn):
+    """
+    :returns: the signature of ``fn`` without its ``timeline`` argument
+    """
+    signature = inspect.signature(fn)
+
+    return signature.replace(
+        parameters=[
+            parameter
+            for name, parameter in signature.parameters.items()
+            if name != "timeline"
+        ]
+    )
+
+
+def _accepts_timeline(fn):
+    """
+    :returns: whether ``fn`` accepts a ``timeline`` argument
+    """
+    try:
+        return "timeline" in inspect.signature(fn).parameters
+    except (TypeError, ValueError):
+        return False
+
+
 class Segment:
     """
     utility class to manage execution result and timings
-    for :class:`SyncRunner
+    for :class:`ScaledRunner` and the other runners.
+
+    Real time is measured with :func:`time.perf_counter_ns` (and is therefore
+    not affected by adjustments of the system clock), cpu time with
+    :func:`time.process_time_ns` and virtual time with the (possibly
+    patched) :func:`time.time` at the points :meth:`begin` and :meth:`end`
+    are called. Errors are stored as a copy without their traceback and
+    chained exceptions so that a segment does not keep the frames of the
+    failed call alive.
     """
 
+    __slots__ = (
+        "__error",
+        "__response",
+        "__start",
+        "__end",
+        "__cpu_start",
+        "__cpu_end",
+        "__virtual_start",
+        "__virtual_end",
+    )
+
     def __init__(self):
-        self.__error = False
+        self.__error = None
         self.__response = None
-        self.__start = time.time()
-        self.__end = None
+        self.__end = self.__cpu_end = self.__virtual_end = None
+        self.begin()
+
+    def begin(self, virtual_time=None):
+        """
+        captures the start of the segment
+
+        :param float virtual_time: the current time of the timeline the
+         segment runs in. Defaults to :func:`time.time`.
+        """
+        self.__virtual_start = time.time() if virtual_time is None else virtual_time
+        self.__cpu_start = time.process_time_ns()
+        self.__start = time.perf_counter_ns()
+
+    def end(self, virtual_time=None):
+        """
+        captures the end of the segment
+
+        :param float virtual_time: the current time of the timeline the
+         segment runs in. Defaults to :func:`time.time`.
+        """
+        self.__end = time.perf_counter_ns()
+        self.__cpu_end = time.process_time_ns()
+        self.__virtual_end = time.time() if virtual_time is None else virtual_time
 
     def complete(self, response):
         """
@@ -63,50 +309,85 @@ class Segment:
     def complete_with_error(self, exception):
         """
         called if the segment errored during execution
+
+        :param exception: the exception or the tuple returned by
+         :func:`sys.exc_info`
         """
-        self.__error = exception
+
+        if isinstance(exception, tuple):
+            exception = exception[1]
+        try:
+            # a copy carries neither the traceback nor the chained exceptions
+            # and leaves those of the exception the caller handles intact
+            self.__error = copy.copy(exception)
+        except Exception:
+            self.__error = exception
 
     @property
     def complete_time(self):
         """
-        returns the completion time
+        returns the completion time (in seconds on the
+        :func:`time.perf_counter` scale)
         """
 
-        return self.__end
+        return None if self.__end is None else self.__end / 1e9
 
     @complete_time.setter
     def complete_time(self, completion_time):
         """
         sets the completion time
         """
-        self.__end = completion_time
+        self.__end = int(completion_time * 1e9)
 
     @property
     def start_time(self):
         """
-        returns the start time
+        returns the start time (in seconds on the
+        :func:`time.perf_counter` scale)
         """
 
-        return self.__start
+        return self.__start / 1e9
 
     @start_time.setter
     def start_time(self, start_time):
         """
         sets the start time
         """
-        self.__start = start_time
+        self.__start = int(start_time * 1e9)
 
     @property
     def runtime(self):
         """
-        returns the total execution time of the segment
+        returns the total (real) execution time of the segment in seconds
         """
 
-        if self.__end:
-            return self.complete_time - self.start_time
-        else:
+        if self.__end is None:
+            raise SegmentNotComplete
+
+        return (self.__end - self.__start) / 1e9
+
+    @property
+    def virtual_runtime(self):
+        """
+        returns the time that elapsed on the timeline during the segment
+        """
+
+        if self.__end is None:
             raise SegmentNotComplete
 
+        return self.__virtual_end - self.__virtual_start
+
+    @property
+    def cpu_time(self):
+        """
+        returns the cpu time consumed by the process during the segment
+        """
+
+        if self.__end is None:
+            raise SegmentNotComplete
+
+        return (self.__cpu_end - self.__cpu_start) / 1e9
+
     @property
     def response(self):
         """
@@ -114,15 +395,286 @@ class Segment:
         the :exception:`exceptions.Exception` that was caught.
         """
 
-        if not self.__end:
+        if self.__end is None:
             raise SegmentNotComplete
         else:
-            if self.__error:
-                raise self.__error[0]
+            if self.__error is not None:
+                raise self.__error
 
             return self.__response
 
 
+class _Patch:
+    """
+    replaces the value of ``attribute`` of ``target`` with ``new`` through
+    :data:`_PATCHES`. If ``attribute`` is ``None`` the target is a
+    :func:`functools.partial` object (whose attributes are read only) and
+    ``new`` is its pickle state.
+    """
+
+    __slots__ = ("target", "attribute", "new")
+
+    def __init__(self, target, attribute, new):
+        self.target = target
+        self.attribute = attribute
+        self.new = new
+
+    def get(self):
+        if self.attribute is None:
+            return self.target.__reduce__()[2]
+
+        return getattr(self.target, self.attribute)
+
+    def set(self, value):
+        if self.attribute is None:
+            self.target.__setstate__(value)
+        else:
+            setattr(self.target, self.attribute, value)
+
+    def start(self):
+        _PATCHES.install(self)
+
+    def stop(self):
+        _PATCHES.uninstall(self)
+
+
+class _PatchRegistry:
+    """
+    process wide registry of the patches installed by active timelines.
+
+    Every patched site keeps its true original and a stack of the patches
+    installed on it, so timelines that overlap (for example because they
+    are entered concurrently from different threads) share the site: the
+    most recently installed patch is the one in effect, uninstalling a patch
+    re-applies the one below it regardless of the order timelines are
+    exited in, and the original is restored when the last one is removed.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sites = {}
+
+    def original(self, target, attribute, value):
+        """
+        :returns: the original value of a site if it is patched or
+         ``value`` otherwise
+        """
+        site = self.sites.get((id(target), attribute))
+
+        return value if site is None else site[1]
+
+    def install(self, patch):
+        key = (id(patch.target), patch.attribute)
+
+        with self.lock:
+            site = self.sites.get(key)
+
+            if site is None:
+                site = self.sites[key] = (patch.target, patch.get(), [])
+            site[2].append(patch)
+            patch.set(patch.new)
+
+    def uninstall(self, patch):
+        key = (id(patch.target), patch.attribute)
+
+        with self.lock:
+            _, original, patches = self.sites[key]
+            top = patches[-1] is patch
+            patches.remove(patch)
+
+            if not patches:
+                del self.sites[key]
+                patch.set(original)
+            elif top:
+                patch.set(patches[-1].new)
+
+    def _after_fork(self):
+        # the lock may have been held by a thread that does not exist
+        # in the child
+        self.lock = threading.Lock()
+
+
+#: patches installed by the timelines of this process
+_PATCHES = _PatchRegistry()
+
+
+class PatchSites:
+    """
+    cache of the places in loaded modules that refer to one of the clocks
+    patched by :class:`Timeline`.
+
+    With the default ``"names"`` :paramref:`mode` only module attributes
+    named after a clock are found (for example a module level
+    ``from time import time``). The ``"identity"`` mode compares every
+    value in the ``__dict__`` of a module with the clocks by identity in a
+    single pass and therefore also finds aliases such as
+    ``from time import time as now``. The ``"deep"`` mode additionally
+    looks one level into the classes and functions defined in the module,
+    :func:`functools.partial` objects and :class:`sched.scheduler`
+    instances, to find class attributes, default argument values,
+    partially applied arguments and scheduler time functions.
+
+    Each module is only scanned the first time it is seen (or when it was
+    replaced in :data:`sys.modules`), so timelines sharing an instance only
+    pay for the modules imported since the previous one was entered and the
+    deeper scans are only paid once.
+
+    .. note:: a reference to a clock that is created after the module was
+       scanned is not patched.
+
+    .. warning:: the ``"identity"`` and ``"deep"`` modes also patch the
+       private aliases used by the standard library (for example
+       ``threading._time``), so that timeouts of locks and queues follow the
+       timeline as well. Use :paramref:`Timeline.exclude` for modules that
+       should keep the real clock. hiro's own modules are never patched.
+
+    :param str mode: one of ``"names"``, ``"identity"`` or ``"deep"``
+    """
+
+    MODES = ("names", "identity", "deep")
+
+    def __init__(self, mode="names"):
+        if mode not in self.MODES:
+            raise ValueError(
+                "mode must be one of %s" % ", ".join(map(repr, self.MODES))
+            )
+        self.mode = mode
+        self.modules = {}
+
+    def scan(self, originals, skip=(), counters=None, rules=None):
+        """
+        :param dict originals: mapping of names to the original clocks
+         (the keys of :attr:`Timeline.func_mappings` and
+         :attr:`Timeline.class_mappings`)
+        :param skip: dotted module attribute paths that should not be
+         reported
+        :param hiro.counters.TimelineCounters counters: counters to record the number
+         of scanned and ignored modules in
+        :param ModuleRules rules: the rules of the timeline. Modules that
+         are excluded by them are neither scanned nor reported.
+        :returns: a list of ``(name, sites)`` tuples for every loaded module
+         with at least one patch site, where ``sites`` is a tuple of
+         ``(target, attribute)`` pairs. ``attribute`` is either the name of
+         an attribute of ``target`` that refers to a clock,
+         ``"__defaults__"`` or ``"__kwdefaults__"`` for functions with
+         clocks as default values, or ``None`` for a
+         :func:`functools.partial` object.
+        """
+        found = []
+
+        names = list(sys.modules.keys())
+
+        for name in names:
+            module = sys.modules.get(name)
+
+            if (
+                rules is not None and rules.lookup(name) is EXCLUDED
+            ) or IGNORED_MODULES.reason(module, name) is not None:
+                if counters is not None:
+                    counters.modules_ignored += 1
+                continue
+            cached = self.modules.get(name)
+
+            if cached is None or cached[0] is not module:
+                if counters is not None:
+                    counters.modules_scanned += 1
+                sites = ()
+
+                try:
+                    sites = self.__scan_module(name, module, originals, skip)
+                # this is done for cases where invalid modules are on
+                # sys modules.
+                except Exception as error:
+                    IGNORED_MODULES.add(module, "scan failed: %r" % error)
+                cached = self.modules[name] = (module, sites)
+
+            if cached[1]:
+                found.append((name, cached[1]))
+
+        # do not keep unloaded modules alive
+        for name in self.modules.keys() - set(names):
+            del self.modules[name]
+
+        return found
+
+    def __scan_module(self, name, module, originals, skip):
+        if self.mode == "names":
+            return tuple(
+                (module, obj)
+                for obj in originals
+                if obj in dir(module)
+                and _PATCHES.original(module, obj, getattr(module, obj))
+                == originals[obj]
+                and "{}.{}".format(name, obj) not in skip
+            )
+
+        if name == __package__ or name.startswith(__package__ + "."):
+            return ()
+        clocks = {id(original) for original in originals.values()}
+        sites = []
+
+        for attribute, value in list(vars(module).items()):
+            if _PATCHES.sites and id(value) not in clocks:
+                # the attribute may be patched by another timeline
+                value = _PATCHES.original(module, attribute, value)
+
+            if id(value) in clocks:
+                if "{}.{}".format(name, attribute) not in skip:
+                    sites.append((module, attribute))
+            elif self.mode == "deep":
+                sites.extend(_scan_value(name, value, clocks))
+
+        return tuple(sites)
+
+
+def _scan_value(module, value, clocks):
+    """
+    :returns: the patch sites one level within ``value``, an attribute of
+     the module named ``module``
+    """
+
+    def refers_to_clock(values):
+        return any(id(item) in clocks for item in values)
+
+    def original(attribute):
+        return _PATCHES.original(value, attribute, getattr(value, attribute))
+
+    if isinstance(value, type) and value.__module__ == module:
+        return [
+            (value, attribute)
+            for attribute, item in list(vars(value).items())
+            if id(_PATCHES.original(value, attribute, item)) in clocks
+        ]
+
+    if isinstance(value, types.FunctionType) and value.__module__ == module:
+        return [
+            (value, attribute)
+            for attribute in ("__defaults__", "__kwdefaults__")
+            if refers_to_clock(
+                (original(attribute) or {}).values()
+                if attribute == "__kwdefaults__"
+                else original(attribute) or ()
+            )
+        ]
+
+    if isinstance(value, partial):
+        func, args, keywords, _ = _PATCHES.original(value, None, value.__reduce__()[2])
+
+        if refers_to_clock((func,) + args) or refers_to_clock(
+            (keywords or {}).values()
+        ):
+            return [(value, None)]
+
+    if isinstance(value, sched.scheduler):
+        return [
+            (value, attribute)
+            for attribute in ("timefunc", "delayfunc")
+            if id(original(attribute)) in clocks
+        ]
+
+    return []
+
+
 class Timeline(Decorator):
     """
     Timeline context manager. Within this context
@@ -168,6 +720,89 @@ class Timeline(Decorator):
     :param start: if specified starts the timeline at the given value (either a
         floating point representing seconds since epoch or a
         :class:`datetime.datetime` object)
+    :param include: if specified only modules in these packages
+        follow the timeline, every other module keeps the real clock.
+    :param exclude: packages whose modules keep the real clock.
+    :param dict factors: mapping of package names to the scale factor their
+        modules should use instead of :paramref:`scale`.
+    :param bool propagate: if ``True`` python subprocesses (including
+        :mod:`multiprocessing` workers) started within the context follow an
+        equivalent timeline. See :mod:`hiro.propagation`.
+    :param str on_fork: what a child forked with :func:`os.fork` does with
+        the timeline while it is active: ``"keep"`` (the default) continues
+        with the inherited state, ``"rebase"`` re-anchors the timeline on the
+        child's clock at the virtual instant of the fork and ``"detach"``
+        restores the real clock in the child, so that it pays no overhead
+        for the timeline at all.
+    :param float budget: the real time (in seconds) that
+        :paramref:`expected_virtual` seconds of virtual time should take.
+        The initial factor is derived from both (instead of
+        :paramref:`scale`) and is adjusted with :meth:`scale` while the
+        timeline is active, based on the measured progress of virtual time
+        against the real time elapsed since it was first entered.
+    :param float expected_virtual: the virtual time (in seconds) the code
+        within the timeline is expected to need.
+    :param bool stats: if ``True`` the activity of the timeline is counted
+        and can be retrieved with :meth:`stats`. Counting only uses plain
+        integers and floats and costs a single attribute check per patched
+        call when disabled.
+    :param int sample_every: if provided, the call site of every
+        ``sample_every``-th call to a patched clock is recorded by a
+        :class:`~hiro.sampling.CallSiteSampler` available as :attr:`sampler`.
+    :param str trace: if provided, the activity of the timeline is
+        recorded by a :class:`~hiro.tracing.TimelineTracer` (available as
+        :attr:`tracer`) and written to this file in the chrome trace event
+        format whenever the timeline is exited.
+    :param int trace_size: the number of events the tracer keeps
+    :param bool detect_unpatched: if ``True`` calls made to the real clocks
+        while the timeline is active (for example through an alias such as
+        ``from time import time as now``) are recorded by an
+        :class:`hiro.detector.UnpatchedClockDetector` available as
+        :attr:`detector`. Requires python 3.12 or newer.
+    :param str scan_mode: how loaded modules are searched for references
+        to the clocks when the timeline is entered. One of ``"names"``
+        (the default), ``"identity"`` or ``"deep"`` (see
+        :class:`PatchSites`).
+    :param PatchSites sites: cache of patch sites to share between
+        timelines that are entered repeatedly (for example by the pytest
+        plugin in :mod:`hiro.pytest_plugin`). If not provided the timeline
+        keeps a cache of its own, so that a module is only scanned the first
+        time the timeline is entered after it was loaded. The cache
+        determines the scan mode.
+    :param bool batch_sleeps: if ``True`` scaled sleeps that are shorter
+        than the minimum real sleep of the platform (calibrated once per
+        process with :func:`hiro.utils.minimum_sleep`) are not slept
+        individually. They are added to a per thread debt that is slept off
+        in one call once it is large enough, and any overshoot of that
+        call is credited against later sleeps. This keeps tight retry loops
+        at the configured acceleration with far fewer syscalls.
+
+    Module scoping applies both to names imported directly from :mod:`time`
+    or :mod:`datetime` (which are patched per module) and to calls made
+    through the modules themselves (which are dispatched on the calling
+    module), for example:
+
+    .. code-block:: python
+
+        # only accelerate the retry backoff of the http client
+        with Timeline(include=["urllib3"], factors={"urllib3": 100}):
+            ...
+
+    .. note:: While :paramref:`include`, :paramref:`exclude` or
+       :paramref:`factors` are in effect, every call to a patched :mod:`time`
+       function made through the module itself inspects the calling frame
+       (:func:`sys._getframe`) to find the rule of the caller, which adds a
+       small cost to every clock read in the process.
+
+    Modules with their own factor keep their own clock which is rebased
+    whenever the timeline is altered, so that they never jump backwards
+    when :meth:`scale`, :meth:`freeze` or :meth:`unfreeze` are invoked.
+
+    Timelines may overlap, either nested or entered concurrently from
+    different threads. The patches they install are shared through a
+    process wide, lock protected registry: the timeline entered last is in
+    effect and exiting the timelines in any order restores the original
+    clocks once the last one exits.
 
     """
 
@@ -176,7 +811,41 @@ class Timeline(Decorator):
         "datetime": (datetime.datetime, Datetime),
     }
 
-    def __init__(self, scale=1, start=None):
+    def __init__(
+        self,
+        scale=1,
+        start=None,
+        include=None,
+        exclude=None,
+        factors=None,
+        propagate=False,
+        on_fork="keep",
+        budget=None,
+        expected_virtual=None,
+        batch_sleeps=False,
+        sites=None,
+        stats=False,
+        sample_every=None,
+        trace=None,
+        trace_size=65536,
+        detect_unpatched=False,
+        scan_mode="names",
+    ):
+        if on_fork not in FORK_POLICIES:
+            raise ValueError(
+                "on_fork must be one of %s" % ", ".join(map(repr, FORK_POLICIES))
+            )
+
+        if scan_mode not in PatchSites.MODES:
+            raise ValueError(
+                "scan_mode must be one of %s" % ", ".join(map(repr, PatchSites.MODES))
+            )
+
+        if (budget is None) != (expected_virtual is None):
+            raise ValueError("budget and expected_virtual must be provided together")
+
+        if budget is not None:
+            scale = float(expected_virtual) / budget
         self.reference = time.time()
         self.offset = (
             time_in_seconds(start) - self.reference if start is not None else 0.0
@@ -204,6 +873,35 @@ class Timeline(Decorator):
             "localtime": (time.localtime, self.__time_localtime),
         }
         self.factor = scale
+        self.rules = ModuleRules.from_config(include, exclude, factors)
+        self.scoping = {"include": include, "exclude": exclude, "factors": factors}
+        self.clocks = {}
+        self.anchors = {}
+        self.propagate = propagate
+        self.exported_environ = None
+        self.on_fork = on_fork
+        self.budget = budget
+        self.expected_virtual = expected_virtual
+        self.budget_start = None
+        self.budget_check = 0
+        self.batch_sleeps = batch_sleeps
+        self.sleep_debt = threading.local()
+        self.sites = sites if sites is not None else PatchSites(scan_mode)
+        self.scan_mode = self.sites.mode
+        #: an instance of :class:`~hiro.counters.TimelineCounters` to record
+        #: the activity of the timeline in (``None`` to disable counting)
+        self.counters = TimelineCounters() if stats else None
+        #: an instance of :class:`~hiro.sampling.CallSiteSampler` recording
+        #: the callers of the patched clocks (``None`` to disable sampling)
+        self.sampler = CallSiteSampler(sample_every) if sample_every else None
+        #: an instance of :class:`~hiro.tracing.TimelineTracer` recording the
+        #: activity of the timeline (``None`` to disable tracing)
+        self.tracer = (
+            TimelineTracer(trace, trace_size, self.__compute_time("time.time"))
+            if trace
+            else None
+        )
+        self.detector = UnpatchedClockDetector(self) if detect_unpatched else None
 
     def _get_original(self, fn_or_mod):
         """
@@ -229,87 +927,261 @@ class Timeline(Decorator):
         else:
             return self.class_mappings[fn_or_mod][1]
 
-    def __compute_time(self, freeze_point, offset, original, unit=1, cast_func=float):
+    def _get_clock(self, rule):
+        """
+        returns the fakes of the :mod:`time` functions for a module
+        scoped by ``rule`` (see :class:`hiro.rules.ModuleRules`)
+        """
+
+        if rule not in self.clocks:
+            if rule is DEFAULT:
+                clock = {name: fake for name, (_, fake) in self.func_mappings.items()}
+            elif rule is EXCLUDED:
+                clock = {name: orig for name, (orig, _) in self.func_mappings.items()}
+            else:
+                clock = {
+                    name: partial(fake, factor=rule)
+                    for name, (_, fake) in self.func_mappings.items()
+                }
+            self.clocks[rule] = clock
+
+        return self.clocks[rule]
+
+    def _get_scoped_fake(self, time_obj):
+        """
+        returns a fake for a :mod:`time` module attribute that dispatches
+        on the :attr:`rules` of the calling module
+        """
+        name = time_obj.split(".")[1]
+
+        def dispatch(*args):
+            frame = sys._getframe(1)
+
+            # calls made by the patched datetime classes are
+            # attributed to their caller
+            while frame.f_globals.get("__name__") == Datetime.__module__:
+                frame = frame.f_back
+            module = frame.f_globals.get("__name__", "")
+
+            return self._get_clock(self.rules.lookup(module))[name](*args)
+
+        return dispatch
+
+    def _get_anchor(self, factor):
+        """
+        returns the ``(anchor, base)`` of the clock used by modules with their
+        own ``factor``: the real time it was last rebased at and the time it
+        showed at that point.
+        """
+
+        if factor not in self.anchors:
+            reference, offset, _, _ = self._get_state()
+            self.anchors[factor] = (reference, reference + offset)
+
+        return self.anchors[factor]
+
+    def __rebase_clocks(self, value=None, shift=0, keep_offset=True):
+        """
+        re-anchors the clocks of modules with their own factor at the current
+        real time so that they continue from the time they currently show
+        (or from :paramref:`value`) when the timeline is altered.
+        """
+        now = self._get_original("time.time")()
+        _, offset, _, freeze_point = self._get_state()
+
+        for factor, (anchor, base) in list(self.anchors.items()):
+            if value is not None:
+                current = value
+            elif freeze_point is not None:
+                current = base + offset if keep_offset else base
+            else:
+                current = base + (now - anchor) * factor
+            self.anchors[factor] = (now, current + shift)
+
+    def _get_state(self):
+        """
+        returns a consistent view of the timeline state as a tuple of
+        ``(reference, offset, factor, freeze_point)``
+        """
+
+        return self.reference, self.offset, self.factor, self.freeze_point
+
+    def __compute_time(
+        self, original, unit=1, cast_func=float, factor=None, state=None
+    ):
         """
         computes the current_time after accounting for
         any adjustments due to :attr:`factor` or invocations
         of :meth:`freeze`, :meth:`rewind` or :meth:`forward`
         """
+        reference, offset, scale, freeze_point = state or self._get_state()
+
+        if factor is not None:
+            anchor, base = self._get_anchor(factor)
+
+            if freeze_point is not None:
+                return unit * (base + offset)
+            delta = self._get_original(original)() - (unit * anchor)
+            return cast_func(unit * base + delta * factor)
+
         if freeze_point is not None:
             return unit * (offset + freeze_point)
         else:
-            delta = self._get_original(original)() - (unit * self.reference)
-            return cast_func(
-                unit * self.reference + (delta * self.factor) + unit * offset
-            )
+            delta = self._get_original(original)() - (unit * reference)
+            factor = scale if factor is None else factor
+            return cast_func(unit * reference + (delta * factor) + unit * offset)
 
     def __check_out_of_bounds(self, offset=None, freeze_point=None):
         """
         ensures that the time that would be calculated based on any
         offset or freeze point would not result in jumping beyond the epoch
         """
+        reference, current_offset, factor, current_freeze_point = self._get_state()
         next_time = self.__compute_time(
-            freeze_point or self.freeze_point, offset or self.offset, "time.time"
+            "time.time",
+            state=(
+                reference,
+                offset or current_offset,
+                factor,
+                freeze_point or current_freeze_point,
+            ),
         )
 
         if next_time < 0:
             raise TimeOutofBounds(next_time)
 
-    def __time_monotonic(self):
+    def __time_monotonic(self, factor=None):
         """
         patched version of :func:`time.monotonic`
         """
 
-        return self.__compute_time(self.freeze_point, self.offset, "time.monotonic")
+        if self.counters is not None:
+            self.counters.reads["time.monotonic"] += 1
 
-    def __time_monotonic_ns(self):
+        if self.sampler is not None:
+            self.sampler.sample()
+
+        return self.__compute_time("time.monotonic", factor=factor)
+
+    def __time_monotonic_ns(self, factor=None):
         """
         patched version of :func:`time.monotonic_ns`
         """
 
-        return self.__compute_time(
-            self.freeze_point, self.offset, "time.monotonic_ns", 1e9, int
-        )
+        if self.counters is not None:
+            self.counters.reads["time.monotonic_ns"] += 1
+
+        if self.sampler is not None:
+            self.sampler.sample()
 
-    def __time_time(self):
+        return self.__compute_time("time.monotonic_ns", 1e9, int, factor)
+
+    def __time_time(self, factor=None):
         """
         patched version of :func:`time.time`
         """
 
-        return self.__compute_time(self.freeze_point, self.offset, "time.time")
+        if self.counters is not None:
+            self.counters.reads["time.time"] += 1
+
+        if self.sampler is not None:
+            self.sampler.sample()
+
+        return self.__current_time(factor)
 
-    def __time_time_ns(self):
+    def __current_time(self, factor=None):
+        if self.budget is not None and factor is None:
+            self._adjust_to_budget()
+
+        return self.__compute_time("time.time", factor=factor)
+
+    def __time_time_ns(self, factor=None):
         """
         patched version of :func:`time.time_ns`
         """
 
-        return self.__compute_time(
-            self.freeze_point, self.offset, "time.time_ns", 1e9, int
-        )
+        if self.counters is not None:
+            self.counters.reads["time.time_ns"] += 1
+
+        if self.sampler is not None:
+            self.sampler.sample()
 
-    def __time_gmtime(self, seconds=None):
+        return self.__compute_time("time.time_ns", 1e9, int, factor)
+
+    def __time_gmtime(self, seconds=None, factor=None):
         """
         patched version of :func:`time.gmtime`
         """
 
+        if self.counters is not None:
+            self.counters.reads["time.gmtime"] += 1
+
+        if self.sampler is not None:
+            self.sampler.sample()
+
         return self._get_original("time.gmtime")(
-            seconds if seconds is not None else self.__time_time()
+            seconds if seconds is not None else self.__current_time(factor)
         )
 
-    def __time_localtime(self, seconds=None):
+    def __time_localtime(self, seconds=None, factor=None):
         """
         patched version of :func:`time.localtime`
         """
 
+        if self.counters is not None:
+            self.counters.reads["time.localtime"] += 1
+
+        if self.sampler is not None:
+            self.sampler.sample()
+
         return self._get_original("time.localtime")(
-            seconds if seconds is not None else self.__time_time()
+            seconds if seconds is not None else self.__current_time(factor)
         )
 
-    def __time_sleep(self, amount):
+    def __time_sleep(self, amount, factor=None):
         """
         patched version of :func:`time.sleep`
         """
-        self._get_original("time.sleep")(1.0 * amount / self.factor)
+
+        if self.budget is not None and factor is None:
+            self._adjust_to_budget()
+        factor = self.factor if factor is None else factor
+        counters, tracer = self.counters, self.tracer
+
+        if self.sampler is not None:
+            self.sampler.sample()
+
+        if counters is not None or tracer is not None:
+            start = time.perf_counter()
+
+        if tracer is not None:
+            virtual_start = self.__compute_time("time.time")
+
+        if self.batch_sleeps:
+            self.__batched_sleep(1.0 * amount / factor)
+        else:
+            self._get_original("time.sleep")(1.0 * amount / factor)
+
+        if counters is not None:
+            counters.sleep_requested += amount
+            counters.sleep_real += time.perf_counter() - start
+
+        if tracer is not None:
+            tracer.record("sleep", virtual_start, amount, start, factor=factor)
+
+    def __batched_sleep(self, duration):
+        """
+        sleeps for ``duration`` real seconds or adds it to the sleep debt
+        of the current thread if it is too short to be slept on its own
+        """
+        sleep = self._get_original("time.sleep")
+        debt = getattr(self.sleep_debt, "value", 0.0) + duration
+
+        if debt >= minimum_sleep(sleep):
+            start = time.perf_counter()
+            sleep(debt)
+            debt -= time.perf_counter() - start
+        self.sleep_debt.value = debt
 
     @chained
     def forward(self, amount):
@@ -326,7 +1198,13 @@ class Timeline(Decorator):
         else:
             offset += amount
         self.__check_out_of_bounds(offset=offset)
+
+        if self.freeze_point is None:
+            self.__rebase_clocks(shift=offset - self.offset)
+        shift = offset - self.offset
         self.offset = offset
+        self._state_changed()
+        self.__trace("forward", amount=shift)
 
     @chained
     def rewind(self, amount):
@@ -343,7 +1221,13 @@ class Timeline(Decorator):
         else:
             offset -= amount
         self.__check_out_of_bounds(offset=offset)
+
+        if self.freeze_point is None:
+            self.__rebase_clocks(shift=offset - self.offset)
+        shift = self.offset - offset
         self.offset = offset
+        self._state_changed()
+        self.__trace("rewind", amount=shift)
 
     @chained
     def freeze(self, target_time=None):
@@ -357,12 +1241,17 @@ class Timeline(Decorator):
         """
 
         if target_time is None:
-            freeze_point = self._get_fake("time.time")()
+            freeze_point = self.__current_time()
+            self.__check_out_of_bounds(freeze_point=freeze_point)
+            self.__rebase_clocks()
         else:
             freeze_point = time_in_seconds(target_time)
-        self.__check_out_of_bounds(freeze_point=freeze_point)
+            self.__check_out_of_bounds(freeze_point=freeze_point)
+            self.__rebase_clocks(value=freeze_point)
         self.freeze_point = freeze_point
         self.offset = 0
+        self._state_changed()
+        self.__trace("freeze")
 
     @chained
     def unfreeze(self):
@@ -381,21 +1270,27 @@ class Timeline(Decorator):
         """
 
         if self.freeze_point is not None:
+            self.__rebase_clocks(keep_offset=False)
             self.reference = self._get_original("time.time")()
             self.offset = time_in_seconds(self.freeze_point) - self.reference
             self.freeze_point = None
+            self._state_changed()
+            self.__trace("unfreeze")
 
     @chained
     def scale(self, factor):
         """
         changes the speed at which time elapses and how long sleeps last for.
+        The timeline continues from the time it currently shows.
 
         :param float factor: > 1 time will go faster and < 1 it will be slowed
             down.
 
         """
+        self.__rebase()
         self.factor = factor
-        self.reference = self._get_original("time.time")()
+        self._state_changed()
+        self.__trace("scale", factor=factor)
 
     @chained
     def reset(self):
@@ -404,48 +1299,306 @@ class Timeline(Decorator):
         with a scale factor 1
         """
 
+        self.__rebase_clocks(value=self._get_original("time.time")())
         self.factor = 1
         self.freeze_point = None
         self.reference = self._get_original("time.time")()
         self.offset = 0
+        self._state_changed()
+        self.__trace("reset")
 
-    def __enter__(self):
-        for name in list(sys.modules.keys()):
-            module = sys.modules[name]
+    def __trace(self, name, **args):
+        """
+        records the event ``name`` with :attr:`tracer` if it is enabled
+        """
 
-            if module in IGNORED_MODULES:
-                continue
-            mappings = copy.copy(self.class_mappings)
-            mappings.update(self.func_mappings)
+        if self.tracer is not None:
+            self.tracer.record(name, self.__compute_time("time.time"), **args)
 
+    def branch(self, variants, fn, max_workers=None):
+        """
+        explores several futures of the timeline in parallel. The process is
+        forked once per variant at the current virtual instant, the variant
+        is applied to the timeline in the child and ``fn`` is run there.
+
+        .. code-block:: python
+
+            with Timeline(scale=100) as timeline:
+                warm_up()
+                segments = timeline.branch(
+                    [{"forward": 3600}, {"scale": 1000}, lambda t: t.freeze()],
+                    simulate,
+                )
+
+        :param variants: an iterable of either mappings of :class:`Timeline`
+         method names to their argument (applied in order, ``None`` invokes
+         the method without an argument) or callables that receive the
+         timeline.
+        :param fn: the callable to run in each branch. If it accepts a
+         ``timeline`` argument the branched timeline is passed to it.
+        :param int max_workers: the maximum number of branches to run at
+         the same time. Defaults to the number of cpus.
+        :returns: a list of :class:`Segment` instances holding the result of
+         each variant (in the same order as ``variants``)
+        """
+
+        if not hasattr(os, "fork"):
+            raise NotImplementedError("branching requires os.fork")
+        variants = list(variants)
+        max_workers = max_workers or os.cpu_count() or 1
+        segments = []
+        # later batches are forked after the timeline moved on, so every
+        # branch is moved back to the instant branch() was called at
+        origin = (
+            self._get_original("time.time")(),
+            self._get_state(),
+            dict(self.anchors),
+        )
+
+        for batch in range(0, len(variants), max_workers):
+            children = [
+                self.__fork_branch(variant, fn, origin)
+                for variant in variants[batch:][:max_workers]
+            ]
+
+            for pid, read in children:
+                with os.fdopen(read, "rb") as result:
+                    payload = result.read()
+                _, status = os.waitpid(pid, 0)
+
+                if not payload or not os.WIFEXITED(status) or os.WEXITSTATUS(status):
+                    raise BranchError(
+                        "branch %d exited without a result (wait status %d)"
+                        % (len(segments), status)
+                    )
+                segments.append(pickle.loads(payload))
+
+        for segment in segments:
+            # the branch failed before or after running ``fn``
+            if isinstance(segment, BaseException):
+                raise segment
+
+        return segments
+
+    def __fork_branch(self, variant, fn, origin):
+        """
+        forks a child that moves the timeline back to ``origin``, applies
+        ``variant`` and runs ``fn``
+        """
+        read, write = os.pipe()
+        pid = os.fork()
+
+        if pid:
+            os.close(write)
+            return pid, read
+
+        os.close(read)
+        status = 1
+        try:
             try:
-                for obj in mappings:
-                    if obj in dir(module) and getattr(
-                        module, obj
-                    ) == self._get_original(obj):
-                        path = "{}.{}".format(name, obj)
-
-                        if path not in self.mock_mappings:
-                            patcher = mock.patch(path, self._get_fake(obj))
-                            patcher.start()
-                            self.patchers.append(patcher)
-            # this is done for cases where invalid modules are on
-            # sys modules.
-            except:  # noqa: E722
-                IGNORED_MODULES.add(module)
+                if self not in _ACTIVE_TIMELINES:
+                    self.__enter__()
+                self.__restore_origin(*origin)
+                segment = Segment()
+
+                if callable(variant):
+                    variant(self)
+                else:
+                    for method, argument in variant.items():
+                        if argument is None:
+                            getattr(self, method)()
+                        else:
+                            getattr(self, method)(argument)
+                try:
+                    if _accepts_timeline(fn):
+                        segment.complete(fn(timeline=self))
+                    else:
+                        segment.complete(fn())
+                # will be rethrown in the parent
+                except Exception as error:
+                    segment.complete_with_error(error)
+                segment.end()
+                payload = pickle.dumps(segment)
+            except BaseException as error:
+                payload = pickle.dumps(error)
+            with os.fdopen(write, "wb") as result:
+                result.write(payload)
+            status = 0
+        finally:
+            # never return into the caller of branch() in the child
+            os._exit(status)
+
+    def __restore_origin(self, real, state, anchors):
+        """
+        restores the timeline ``state`` captured at the real time ``real``
+        so that it shows the same time it showed then
+        """
+        reference, offset, factor, freeze_point = state
+        lag = self._get_original("time.time")() - real if freeze_point is None else 0
+        self.reference, self.offset = reference + lag, offset - lag
+        self.factor, self.freeze_point = factor, freeze_point
+        self.anchors.update(
+            (scale, (anchor + lag, base)) for scale, (anchor, base) in anchors.items()
+        )
+        self._state_changed()
+
+    def _after_fork(self):
+        """
+        called in a forked child while the timeline is active
+        """
+
+        if self.on_fork == "detach":
+            self.__exit__(None, None, None)
+        elif self.on_fork == "rebase":
+            self._rebase()
+
+    def _rebase(self):
+        """
+        re-anchors the timeline on the current real time without altering
+        the virtual time it shows
+        """
+        self.__rebase()
+
+    def __rebase(self):
+        if self.freeze_point is None:
+            self.__rebase_clocks()
+            current = self.__time_time()
+            self.reference = self._get_original("time.time")()
+            self.offset = current - self.reference
+        else:
+            self.reference = self._get_original("time.time")()
+
+    def _adjust_to_budget(self):
+        """
+        changes the factor of the timeline so that the remainder of
+        :attr:`expected_virtual` elapses within the remainder of
+        :attr:`budget`. Invoked from the patched :func:`time.time` and
+        :func:`time.sleep` at most 100 times per budget.
+        """
+        now = self._get_original("time.time")()
+
+        if now < self.budget_check or self.budget_start is None:
+            return
+        self.budget_check = now + self.budget / 100.0
+
+        if self.freeze_point is not None:
+            return
+        real_start, virtual_start = self.budget_start
+        remaining_virtual = self.expected_virtual - (self.__time_time() - virtual_start)
+
+        if remaining_virtual > 0:
+            remaining_real = max(self.budget - (now - real_start), self.budget / 100.0)
+            self.scale(remaining_virtual / remaining_real)
+
+    def _state_changed(self):
+        """
+        called after every alteration of the timeline
+        """
+
+        if self.exported_environ is not None:
+            propagation.export(self)
+
+    def stats(self):
+        """
+        :returns: a :class:`dict` with a snapshot of the
+         :class:`~hiro.counters.TimelineCounters` of the timeline or ``None``
+         if it was not created with :paramref:`Timeline.stats`
+        """
+
+        if self.counters is None:
+            return None
+
+        return self.counters.as_dict()
+
+    def __enter__(self):
+        counters = self.counters
+
+        if counters is not None:
+            start = time.perf_counter()
+            patch_sites = len(self.patchers)
+        sites = self.sites
+        originals = {
+            obj: self._get_original(obj)
+            for obj in itertools.chain(self.class_mappings, self.func_mappings)
+        }
+        names = {id(original): obj for obj, original in originals.items()}
+
+        for name, module_sites in sites.scan(
+            originals, self.mock_mappings, counters, self.rules
+        ):
+            rule = self.rules.lookup(name) if self.rules else DEFAULT
+            clock = self._get_clock(rule)
+
+            def replace(value):
+                obj = names.get(id(value))
+
+                if obj is None:
+                    return value
+
+                return clock.get(obj) or self._get_fake(obj)
+
+            for target, attribute in module_sites:
+                patcher = _site_patcher(target, attribute, replace)
+
+                # the site may have been rebound since it was cached
+                if patcher is not None:
+                    patcher.start()
+                    self.patchers.append(patcher)
 
         for time_obj in self.mock_mappings:
-            patcher = mock.patch(time_obj, self._get_fake(time_obj))
+            if self.rules and time_obj.startswith("time."):
+                fake = self._get_scoped_fake(time_obj)
+            else:
+                fake = self._get_fake(time_obj)
+            module, _, attribute = time_obj.rpartition(".")
+            patcher = _Patch(sys.modules[module], attribute, fake)
             patcher.start()
             self.patchers.append(patcher)
 
+        if self.propagate:
+            self.exported_environ = propagation.export(self)
+        _ACTIVE_TIMELINES.add(self)
+
+        if self.budget is not None and self.budget_start is None:
+            self.budget_start = (
+                self._get_original("time.time")(),
+                self.__compute_time("time.time"),
+            )
+
+        if counters is not None:
+            counters.patch_sites += len(self.patchers) - patch_sites
+            counters.enter_time += time.perf_counter() - start
+        self.__trace("enter")
+
+        if self.detector is not None:
+            self.detector.start()
+
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
+        counters = self.counters
+
+        if counters is not None:
+            start = time.perf_counter()
+        if self.detector is not None:
+            self.detector.stop()
+        self.__trace("exit")
+        _ACTIVE_TIMELINES.discard(self)
+
         for patcher in self.patchers:
             patcher.stop()
         self.patchers = []
 
+        if self.exported_environ is not None:
+            propagation.restore(self.exported_environ)
+            self.exported_environ = None
+
+        if counters is not None:
+            counters.exit_time += time.perf_counter() - start
+
+        if self.tracer is not None:
+            self.tracer.write()
+
 
 class ScaledRunner:
     """
@@ -465,14 +1618,14 @@ class ScaledRunner:
         """
         managed execution of :attr:`func`
         """
-        self.segment.start_time = time.time()
         with Timeline(scale=self.factor):
+            self.segment.begin()
             try:
                 self.segment.complete(self.func(*self.func_args, **self.func_kwargs))
             # will be rethrown
             except:  # noqa: E722
                 self.segment.complete_with_error(sys.exc_info())
-        self.segment.complete_time = time.time()
+            self.segment.end()
 
     def __call__(self):
         self._run()
@@ -494,6 +1647,21 @@ class ScaledRunner:
 
         return self.segment.runtime
 
+    def get_virtual_time(self):
+        """
+        :returns: the time that elapsed on the timeline while :attr:`func`
+         was executing
+        """
+
+        return self.segment.virtual_runtime
+
+    def get_cpu_time(self):
+        """
+        :returns: the cpu time consumed while :attr:`func` was executing
+        """
+
+        return self.segment.cpu_time
+
 
 class ScaledThreadedRunner(ScaledRunner):
     """
@@ -525,6 +1693,299 @@ class ScaledThreadedRunner(ScaledRunner):
         return self.thread_runner.join()
 
 
+class TimelineFuture(concurrent.futures.Future):
+    """
+    :class:`concurrent.futures.Future` returned by :class:`TimelineExecutor`
+    that additionally carries the timings of the execution.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.segment = Segment()
+
+    def get_execution_time(self):
+        """
+        :returns: the real execution time of the callable in seconds
+        """
+
+        return self.segment.runtime
+
+    def get_virtual_time(self):
+        """
+        :returns: the time that elapsed on the timeline while the
+         callable was executing
+        """
+
+        return self.segment.virtual_runtime
+
+
+class TimelineExecutor(concurrent.futures.Executor):
+    """
+    :class:`concurrent.futures.Executor` that runs submitted callables on a
+    fixed pool of threads within a single :class:`hiro.Timeline` which is
+    entered when the executor is created and exited on :meth:`shutdown`.
+
+    The returned :class:`TimelineFuture` instances work with
+    :func:`concurrent.futures.as_completed` and
+    :func:`concurrent.futures.wait`.
+
+    .. code-block:: python
+
+        with TimelineExecutor(100, max_workers=8) as executor:
+            futures = [executor.submit(job, i) for i in range(1000)]
+            for future in concurrent.futures.as_completed(futures):
+                future.result(), future.get_execution_time()
+
+    :param float factor: scale factor to use for the timeline
+    :param int max_workers: the maximum number of threads to use
+    """
+
+    def __init__(self, factor, max_workers=None):
+        self.factor = factor
+        self.timeline = Timeline(scale=factor).__enter__()
+        self.__pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+
+    def submit(self, fn, *args, **kwargs):
+        future = TimelineFuture()
+        self.__pool.submit(self.__run, future, fn, args, kwargs)
+
+        return future
+
+    def __run(self, future, fn, args, kwargs):
+        """
+        managed execution of ``fn`` on behalf of ``future``
+        """
+
+        if not future.set_running_or_notify_cancel():
+            return
+        future.segment.begin()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as error:
+            future.segment.end()
+            future.segment.complete_with_error(error)
+            future.set_exception(error)
+        else:
+            future.segment.end()
+            future.segment.complete(result)
+            future.set_result(result)
+
+    def shutdown(self, wait=True, **kwargs):
+        """
+        shuts down the thread pool and exits the timeline once all pending
+        calls have completed (in the background if ``wait`` is ``False``).
+        """
+        self.__pool.shutdown(wait=False, **kwargs)
+
+        if wait:
+            self.__exit_timeline()
+        else:
+            threading.Thread(target=self.__exit_timeline, daemon=True).start()
+
+    def __exit_timeline(self):
+        self.__pool.shutdown(wait=True)
+        self.timeline.__exit__(None, None, None)
+
+
+_WORKER_TIMELINE = None
+
+
+def _start_worker_timeline(state):
+    """
+    enters the timeline serialized in ``state`` for the lifetime of a
+    :class:`TimelineProcessExecutor` worker process
+    """
+    global _WORKER_TIMELINE
+
+    if _WORKER_TIMELINE is not None:
+        _WORKER_TIMELINE.__exit__(None, None, None)
+    _WORKER_TIMELINE = propagation.loads(state, propagate=False).__enter__()
+
+
+def _run_in_worker(fn, args, kwargs):
+    """
+    managed execution of ``fn`` in a :class:`TimelineProcessExecutor`
+    worker process
+
+    :returns: the :class:`Segment` with the result
+    """
+    segment = Segment()
+    try:
+        segment.complete(fn(*args, **kwargs))
+    # will be rethrown in the parent
+    except Exception as error:
+        segment.complete_with_error(error)
+    segment.end()
+
+    return segment
+
+
+class TimelineProcessExecutor(concurrent.futures.Executor):
+    """
+    :class:`concurrent.futures.Executor` that runs submitted callables in a
+    pool of worker processes. Each worker enters a timeline equivalent to
+    the one described by :paramref:`factor` (sharing the same virtual
+    clock) when it starts, so CPU bound workloads can use all cores.
+
+    Callables, their arguments and results must be picklable. The returned
+    :class:`TimelineFuture` instances carry the timings measured in the
+    worker.
+
+    :param float factor: scale factor to use for the timeline
+    :param int max_workers: the maximum number of processes to use
+    :param mp_context: the :mod:`multiprocessing` context to start
+     workers with
+    """
+
+    def __init__(self, factor, max_workers=None, mp_context=None):
+        self.factor = factor
+        self.timeline = Timeline(scale=factor)
+        self.__pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=mp_context,
+            initializer=_start_worker_timeline,
+            initargs=(propagation.dumps(self.timeline),),
+        )
+
+    def submit(self, fn, *args, **kwargs):
+        future = TimelineFuture()
+        inner = self.__pool.submit(_run_in_worker, fn, args, kwargs)
+        inner.add_done_callback(partial(self.__complete, future))
+
+        return future
+
+    def __complete(self, future, inner):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.segment = inner.result()
+        except BaseException as error:
+            # the pool failed to run the callable (e.g. it could not be
+            # pickled or a worker died), so the segment never reached a worker
+            future.segment.end()
+            future.segment.complete_with_error(error)
+            future.set_exception(error)
+            return
+        try:
+            future.set_result(future.segment.response)
+        except BaseException as error:
+            future.set_exception(error)
+
+    def shutdown(self, wait=True, **kwargs):
+        self.__pool.shutdown(wait=wait, **kwargs)
+
+
+class ScaledProcessRunner(ScaledRunner):
+    """
+    manages the execution of a callable in a separate process within a
+    :class:`hiro.Timeline` context.
+    """
+
+    def _run(self):
+        """
+        managed execution of :attr:`func` in a worker process
+        """
+        with TimelineProcessExecutor(self.factor, max_workers=1) as executor:
+            future = executor.submit(self.func, *self.func_args, **self.func_kwargs)
+            concurrent.futures.wait([future])
+        self.segment = future.segment
+
+
+class ScaledSelector(selectors.BaseSelector):
+    """
+    selector that shortens the time an event loop waits for i/o by the
+    factor of a :class:`hiro.Timeline`, so that timers scheduled with
+    :func:`asyncio.sleep` or :meth:`asyncio.loop.call_later` expire after
+    the scaled real time.
+    """
+
+    def __init__(self, timeline, selector=None):
+        self.timeline = timeline
+        self.selector = selector or selectors.DefaultSelector()
+
+    def register(self, fileobj, events, data=None):
+        return self.selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self.selector.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self.selector.modify(fileobj, events, data)
+
+    def select(self, timeout=None):
+        if timeout is not None and timeout > 0:
+            timeout = timeout / self.timeline.factor
+
+        return self.selector.select(timeout)
+
+    def close(self):
+        self.selector.close()
+
+    def get_key(self, fileobj):
+        return self.selector.get_key(fileobj)
+
+    def get_map(self):
+        return self.selector.get_map()
+
+
+def _new_event_loop(timeline):
+    """
+    returns an event loop whose timers follow ``timeline``
+    """
+
+    return asyncio.SelectorEventLoop(ScaledSelector(timeline))
+
+
+async def _timed_coroutine(coro_fn, args, kwargs):
+    """
+    awaits ``coro_fn`` and captures its result and timings
+
+    :returns: the :class:`Segment` with the result
+    """
+    segment = Segment()
+    try:
+        segment.complete(await coro_fn(*args, **kwargs))
+    # will be rethrown
+    except Exception:
+        segment.complete_with_error(sys.exc_info())
+    segment.end()
+
+    return segment
+
+
+async def _gather(coroutines):
+    return await asyncio.gather(*coroutines)
+
+
+class ScaledCoroutineRunner(ScaledRunner):
+    """
+    manages the execution of a coroutine function on an event loop within a
+    :class:`hiro.Timeline` context.
+
+    .. warning:: timers never expire on a frozen timeline
+    """
+
+    def _run(self):
+        """
+        managed execution of :attr:`func` on a new event loop
+        """
+        with Timeline(scale=self.factor) as timeline:
+            loop = _new_event_loop(timeline)
+            try:
+                self.segment = loop.run_until_complete(
+                    _timed_coroutine(self.func, self.func_args, self.func_kwargs)
+                )
+            finally:
+                loop.close()
+
+
+StreamItem = collections.namedtuple("StreamItem", "value virtual_time real_time")
+StreamItem.__doc__ = """
+an item produced by :func:`run_stream` together with the virtual and real
+time at which it was produced
+"""
+
+
 def run_sync(factor, func, *args, **kwargs):
     """
     Executes a callable within a :class:`hiro.Timeline`
@@ -555,6 +2016,140 @@ def run_threaded(factor, func, *args, **kwargs):
     return ScaledThreadedRunner(factor, func, *args, **kwargs)
 
 
+def run_batch(factor, calls):
+    """
+    Executes many callables within a single :class:`hiro.Timeline` so that
+    the module scan and patching is only done once for the whole batch.
+    The timeline is reset between calls, so each callable starts at the
+    current time with the given scale factor.
+
+    :param int factor: scale factor to use for the timeline during execution
+    :param calls: an iterable of either callables or tuples of
+     ``(func, args)`` or ``(func, args, kwargs)``
+    :returns: a list of :class:`hiro.core.Segment` instances, one per call
+
+    """
+    segments = []
+
+    with Timeline(scale=factor) as timeline:
+        for call in calls:
+            if callable(call):
+                func, args, kwargs = call, (), {}
+            else:
+                func, args, kwargs = (tuple(call) + ({},))[:3]
+            timeline.reset().scale(factor)
+            segment = Segment()
+            try:
+                segment.complete(func(*args, **kwargs))
+            # will be rethrown
+            except:  # noqa: E722
+                segment.complete_with_error(sys.exc_info())
+            segment.end()
+            segments.append(segment)
+
+    return segments
+
+
+def run_process(factor, func, *args, **kwargs):
+    """
+    Executes a callable in a separate process within a :class:`hiro.Timeline`
+
+    :param int factor: scale factor to use for the timeline during execution
+    :param function func: the function to invoke (must be picklable)
+    :param args: the arguments to pass to the function
+    :param kwargs: the keyword arguments to pass to the function
+    :returns: an instance of :class:`hiro.core.ScaledProcessRunner`
+
+    """
+
+    return ScaledProcessRunner(factor, func, *args, **kwargs)
+
+
+def run_coroutine(factor, coro_fn, *args, **kwargs):
+    """
+    Executes a coroutine function on an event loop within a
+    :class:`hiro.Timeline`
+
+    :param int factor: scale factor to use for the timeline during execution
+    :param coro_fn: the coroutine function to await
+    :param args: the arguments to pass to the coroutine function
+    :param kwargs: the keyword arguments to pass to the coroutine function
+    :returns: an instance of :class:`hiro.core.ScaledCoroutineRunner`
+
+    """
+
+    return ScaledCoroutineRunner(factor, coro_fn, *args, **kwargs)
+
+
+def run_gather(factor, calls):
+    """
+    Executes many coroutine functions concurrently on one event loop within
+    a :class:`hiro.Timeline`
+
+    :param int factor: scale factor to use for the timeline during execution
+    :param calls: an iterable of either coroutine functions or tuples of
+     ``(coro_fn, args)`` or ``(coro_fn, args, kwargs)``
+    :returns: a list of :class:`hiro.core.Segment` instances, one per call
+
+    """
+    coroutines = []
+
+    with Timeline(scale=factor) as timeline:
+        for call in calls:
+            if callable(call):
+                coro_fn, args, kwargs = call, (), {}
+            else:
+                coro_fn, args, kwargs = (tuple(call) + ({},))[:3]
+            coroutines.append(_timed_coroutine(coro_fn, args, kwargs))
+        loop = _new_event_loop(timeline)
+        try:
+            segments = loop.run_until_complete(_gather(coroutines))
+        finally:
+            loop.close()
+
+    return segments
+
+
+def run_stream(factor, gen_fn, *args, **kwargs):
+    """
+    Iterates a generator within a :class:`hiro.Timeline`. The timeline is
+    only entered while the generator is resumed, so the consumer runs on the
+    real clock and can process the items incrementally.
+
+    .. code-block:: python
+
+        for item in hiro.run_stream(3600, poll_sensor):
+            print(item.virtual_time, item.value)
+
+    :param int factor: scale factor to use for the timeline while the
+     generator is running
+    :param function gen_fn: the generator function to iterate
+    :param args: the arguments to pass to the generator function
+    :param kwargs: the keyword arguments to pass to the generator function
+    :returns: a generator of :class:`hiro.core.StreamItem` instances
+
+    """
+    # the timeline keeps its patch sites, so only the first entry scans the
+    # loaded modules
+    timeline = Timeline(scale=factor)
+    real_time = timeline._get_original("time.time")
+
+    with timeline:
+        generator = gen_fn(*args, **kwargs)
+    try:
+        while True:
+            with timeline:
+                try:
+                    value = next(generator)
+                except StopIteration:
+                    return
+                virtual_time = time.time()
+            yield StreamItem(value, virtual_time, real_time())
+    finally:
+        with timeline:
+            generator.close()
+
+
 # For backward compatibility
 
 
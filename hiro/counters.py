@@ -0,0 +1,70 @@
+"""
+counters of the activity of a :class:`hiro.Timeline`
+"""
+
+#: clocks whose reads are counted by :class:`TimelineCounters`
+CLOCKS = (
+    "time.time",
+    "time.time_ns",
+    "time.monotonic",
+    "time.monotonic_ns",
+    "time.gmtime",
+    "time.localtime",
+)
+
+
+class TimelineCounters:
+    """
+    activity of a :class:`hiro.Timeline` collected while it is assigned to
+    :attr:`hiro.Timeline.counters` (see the :paramref:`hiro.Timeline.stats`
+    argument)
+
+    - ``modules_scanned``: number of modules scanned for patch sites
+    - ``modules_ignored``: number of modules skipped because they are in
+      :data:`hiro.core.IGNORED_MODULES`
+    - ``patch_sites``: number of module attributes patched
+    - ``enter_time`` / ``exit_time``: total seconds spent in
+      :meth:`hiro.Timeline.__enter__` and :meth:`hiro.Timeline.__exit__`
+    - ``reads``: number of reads of each patched clock
+    - ``sleep_requested``: total (virtual) seconds passed to
+      :func:`time.sleep`
+    - ``sleep_real``: total seconds actually slept
+    """
+
+    __slots__ = (
+        "modules_scanned",
+        "modules_ignored",
+        "patch_sites",
+        "enter_time",
+        "exit_time",
+        "reads",
+        "sleep_requested",
+        "sleep_real",
+    )
+
+    def __init__(self):
+        self.modules_scanned = 0
+        self.modules_ignored = 0
+        self.patch_sites = 0
+        self.enter_time = 0.0
+        self.exit_time = 0.0
+        self.reads = dict.fromkeys(CLOCKS, 0)
+        self.sleep_requested = 0.0
+        self.sleep_real = 0.0
+
+    def as_dict(self):
+        """
+        :returns: a snapshot of the counters as a :class:`dict`
+        """
+        stats = {name: getattr(self, name) for name in self.__slots__}
+        stats["reads"] = dict(self.reads)
+
+        return stats
+
+    @property
+    def sleep_saved(self):
+        """
+        the real time (in seconds) saved by scaling sleeps
+        """
+
+        return self.sleep_requested - self.sleep_real
@@ -0,0 +1,152 @@
+"""
+detection of calls to the real clocks while a :class:`hiro.Timeline` is
+active, for example through aliases such as ``from time import time as now``
+or references cached in class attributes that escape the patching of
+:meth:`hiro.Timeline.__enter__`.
+"""
+import collections
+import os
+import sys
+
+from .rules import EXCLUDED
+
+#: :mod:`sys.monitoring` tool ids that are not reserved by python
+_TOOL_IDS = (3, 4)
+_HIRO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+UnpatchedCall = collections.namedtuple("UnpatchedCall", "filename lineno clock")
+UnpatchedCall.__doc__ = """
+a call site that called the real ``clock`` while the timeline was active
+"""
+
+
+def _lineno(code, offset):
+    for start, end, line in code.co_lines():
+        if start <= offset < end:
+            return line
+
+
+class UnpatchedClockDetector:
+    """
+    uses the ``CALL`` events of :mod:`sys.monitoring` (python 3.12+) to flag
+    calls to the original clocks of :paramref:`timeline` while the detector
+    is started. Modules that are excluded by the rules of the timeline and
+    hiro itself are not reported.
+
+    To keep the overhead low every call site that calls something other
+    than a clock is disabled after its first call, so a call site that
+    calls a clock only after having called something else is not reported.
+    Disabled call sites are enabled again when a detector is started.
+    Nothing is monitored while the detector is stopped.
+
+    .. code-block:: python
+
+        timeline = Timeline(scale=100, detect_unpatched=True)
+        with timeline:
+            ...
+        timeline.detector.report()
+
+    :param timeline: the :class:`hiro.Timeline` whose clocks are monitored
+    """
+
+    def __init__(self, timeline):
+        if not hasattr(sys, "monitoring"):
+            raise NotImplementedError(
+                "detecting unpatched clocks requires python 3.12 or newer"
+            )
+        self.timeline = timeline
+        self.tool_id = None
+        #: number of calls per :class:`UnpatchedCall`
+        self.calls = collections.Counter()
+        self.__clocks = {
+            id(timeline._get_original(name)): name
+            for name in timeline.mock_mappings
+            if name.startswith("time.")
+        }
+        self.__datetime = timeline._get_original("datetime.datetime")
+        self.__date = timeline._get_original("datetime.date")
+
+    def start(self):
+        """
+        starts monitoring calls
+        """
+        monitoring = sys.monitoring
+
+        for tool_id in _TOOL_IDS:
+            if monitoring.get_tool(tool_id) is None:
+                break
+        else:
+            raise RuntimeError("no sys.monitoring tool id is available for hiro")
+        monitoring.use_tool_id(tool_id, "hiro")
+        monitoring.register_callback(tool_id, monitoring.events.CALL, self.__on_call)
+        monitoring.set_events(tool_id, monitoring.events.CALL)
+        # call sites disabled while a previous detector was started would
+        # otherwise stay disabled
+        monitoring.restart_events()
+        self.tool_id = tool_id
+
+    def stop(self):
+        """
+        stops monitoring calls
+        """
+
+        if self.tool_id is None:
+            return
+        monitoring = sys.monitoring
+        monitoring.set_events(self.tool_id, 0)
+        monitoring.register_callback(self.tool_id, monitoring.events.CALL, None)
+        monitoring.free_tool_id(self.tool_id)
+        self.tool_id = None
+
+    def __enter__(self):
+        self.start()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __clock_name(self, fn):
+        name = self.__clocks.get(id(fn))
+
+        if name is not None:
+            return name
+        owner = getattr(fn, "__self__", None)
+
+        if owner is self.__datetime and fn.__name__ in ("now", "utcnow"):
+            return "datetime.datetime.%s" % fn.__name__
+
+        if owner is self.__date and fn.__name__ == "today":
+            return "datetime.date.today"
+
+    def __on_call(self, code, offset, fn, arg0):
+        clock = self.__clock_name(fn)
+
+        if clock is None or code.co_filename.startswith(_HIRO_DIR + os.sep):
+            return sys.monitoring.DISABLE
+
+        if self.timeline.rules is not None:
+            frame = sys._getframe(1)
+
+            while frame is not None and frame.f_code is not code:
+                frame = frame.f_back
+            module = frame.f_globals.get("__name__", "") if frame else ""
+
+            # not disabled, other timelines may not exclude the module
+            if self.timeline.rules.lookup(module) is EXCLUDED:
+                return
+        self.calls[UnpatchedCall(code.co_filename, _lineno(code, offset), clock)] += 1
+
+    def report(self, file=None):
+        """
+        writes the call sites that called a real clock to ``file``
+        (:data:`sys.stderr` by default)
+        """
+        file = file if file is not None else sys.stderr
+
+        for call, count in self.calls.most_common():
+            print(
+                "%8d  %s:%s called the real %s"
+                % (count, call.filename, call.lineno, call.clock),
+                file=file,
+            )
@@ -34,3 +34,17 @@ class InvalidTypeError(TypeError):
             "are supported" % type(value)
         )
         super().__init__(message)
+
+
+class SharedTimelineError(Exception):
+    """
+    used to raise an exception when the segment of a
+    :class:`hiro.SharedTimeline` can not be used
+    """
+
+
+class BranchError(Exception):
+    """
+    used to raise an exception when a branch of :meth:`hiro.Timeline.branch`
+    exits without reporting its result
+    """
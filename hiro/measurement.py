@@ -0,0 +1,287 @@
+"""
+repeated execution statistics for callables run within a :class:`hiro.Timeline`
+"""
+import concurrent.futures
+import math
+import time
+from array import array
+
+from .core import Timeline, run_sync
+
+#: smallest duration (in seconds) distinguished by :class:`Distribution`
+RESOLUTION = 1e-9
+#: number of histogram buckets per power of two
+SUB_BUCKETS = 4
+#: number of histogram buckets (covering up to ~ 2 ** 60 ns)
+BUCKETS = 60 * SUB_BUCKETS
+
+
+class Distribution:
+    """
+    durations (in seconds) collected by :func:`measure`. Samples and the
+    log scale histogram are kept in :class:`array.array` instances so that
+    collecting millions of samples does not allocate an object per sample.
+    """
+
+    def __init__(self):
+        self.samples = array("d")
+        self.buckets = array("Q", bytes(8 * BUCKETS))
+        self.__sorted = None
+
+    def add(self, value):
+        """
+        records a duration of ``value`` seconds
+        """
+        self.samples.append(value)
+        self.buckets[self.bucket(value)] += 1
+        self.__sorted = None
+
+    @staticmethod
+    def bucket(value):
+        """
+        :returns: the index of the histogram bucket ``value`` falls in
+        """
+
+        if value <= RESOLUTION:
+            return 0
+
+        return min(int(math.log2(value / RESOLUTION) * SUB_BUCKETS), BUCKETS - 1)
+
+    @staticmethod
+    def bucket_bounds(index):
+        """
+        :returns: the ``(lower, upper)`` bounds of the histogram bucket
+         ``index`` in seconds
+        """
+
+        return (
+            RESOLUTION * 2 ** (index / SUB_BUCKETS),
+            RESOLUTION * 2 ** ((index + 1) / SUB_BUCKETS),
+        )
+
+    def __len__(self):
+        return len(self.samples)
+
+    @property
+    def min(self):
+        return min(self.samples)
+
+    @property
+    def max(self):
+        return max(self.samples)
+
+    @property
+    def mean(self):
+        return math.fsum(self.samples) / len(self.samples)
+
+    def percentile(self, percent):
+        """
+        :returns: the sample at ``percent`` (0 - 100) using the nearest rank
+         method
+        """
+
+        if self.__sorted is None:
+            self.__sorted = array("d", sorted(self.samples))
+        rank = max(int(math.ceil(percent / 100.0 * len(self.__sorted))), 1)
+
+        return self.__sorted[rank - 1]
+
+    @property
+    def p50(self):
+        return self.percentile(50)
+
+    @property
+    def p95(self):
+        return self.percentile(95)
+
+    @property
+    def p99(self):
+        return self.percentile(99)
+
+    def histogram(self):
+        """
+        :returns: a list of ``(lower, upper, count)`` tuples for every
+         non empty bucket of the log scale histogram
+        """
+
+        return [
+            self.bucket_bounds(index) + (count,)
+            for index, count in enumerate(self.buckets)
+            if count
+        ]
+
+    def summary(self):
+        """
+        :returns: a dictionary of the summary statistics
+        """
+
+        return {
+            "count": len(self),
+            "min": self.min,
+            "mean": self.mean,
+            "p50": self.p50,
+            "p95": self.p95,
+            "p99": self.p99,
+            "max": self.max,
+        }
+
+
+class Measurement:
+    """
+    statistics returned by :func:`measure`
+
+    :ivar real: :class:`Distribution` of the real durations
+    :ivar virtual: :class:`Distribution` of the durations on the timeline
+    :ivar int errors: the number of calls that raised an exception
+    """
+
+    def __init__(self):
+        self.real = Distribution()
+        self.virtual = Distribution()
+        self.errors = 0
+
+
+def measure(factor, fn, *args, repeat=100, warmup=0, **kwargs):
+    """
+    Executes a callable repeatedly within a single :class:`hiro.Timeline`
+    and collects statistics of its real and virtual durations. The
+    timeline is reset before each call.
+
+    .. code-block:: python
+
+        stats = hiro.measure(100, retry_request, repeat=1000, warmup=10)
+        stats.real.p99, stats.virtual.mean, stats.real.histogram()
+
+    :param int factor: scale factor to use for the timeline during execution
+    :param function fn: the function to invoke
+    :param int repeat: the number of measured calls
+    :param int warmup: the number of calls made before measuring
+    :param args: the arguments to pass to the function
+    :param kwargs: the keyword arguments to pass to the function
+    :returns: an instance of :class:`hiro.measurement.Measurement`
+    """
+    measurement = Measurement()
+
+    with Timeline(scale=factor) as timeline:
+        for iteration in range(warmup + repeat):
+            timeline.reset().scale(factor)
+            virtual_start = time.time()
+            start = time.perf_counter_ns()
+            try:
+                fn(*args, **kwargs)
+            except Exception:
+                measurement.errors += iteration >= warmup
+            end = time.perf_counter_ns()
+
+            if iteration >= warmup:
+                measurement.real.add((end - start) / 1e9)
+                measurement.virtual.add(time.time() - virtual_start)
+
+    return measurement
+
+
+def _run_at_factor(factor, fn, args, kwargs):
+    """
+    worker process entry point for :func:`sweep`
+    """
+
+    return run_sync(factor, fn, *args, **kwargs).segment
+
+
+def _equivalent(tolerance):
+    def compare(reference, segment):
+        try:
+            if segment.response != reference.response:
+                return False
+        except Exception:
+            return False
+        expected = reference.virtual_runtime
+
+        return abs(segment.virtual_runtime - expected) <= tolerance * abs(expected)
+
+    return compare
+
+
+class Sweep:
+    """
+    result of :func:`sweep`
+
+    :ivar reference: the :class:`hiro.core.Segment` of the reference run
+    :ivar dict segments: the :class:`hiro.core.Segment` of the run at
+     each factor
+    :ivar dict equivalent: whether the run at each factor was equivalent to
+     the reference run
+    """
+
+    def __init__(self, reference, segments, equivalent):
+        self.reference = reference
+        self.segments = segments
+        self.equivalent = equivalent
+
+    @property
+    def max_safe_factor(self):
+        """
+        the highest factor for which the run at that factor and at every
+        lower factor was equivalent to the reference run (or ``None``)
+        """
+        safe = None
+
+        for factor in sorted(self.equivalent):
+            if not self.equivalent[factor]:
+                break
+            safe = factor
+
+        return safe
+
+
+def sweep(
+    fn,
+    factors,
+    *args,
+    reference_factor=1,
+    compare=None,
+    tolerance=0.05,
+    max_workers=None,
+    **kwargs
+):
+    """
+    Runs a workload at increasing scale factors in parallel processes and
+    compares each run with a reference run to find the highest factor that
+    still produces equivalent behaviour.
+
+    .. code-block:: python
+
+        result = hiro.sweep(retry_until_healthy, [10, 100, 1000, 10000])
+        result.max_safe_factor
+
+    :param function fn: the workload (must be picklable)
+    :param factors: the scale factors to try
+    :param float reference_factor: the factor of the reference run
+    :param compare: a callable receiving the reference
+     :class:`hiro.core.Segment` and the one of a run at some factor and
+     returning whether they are equivalent. By default runs are equivalent
+     if they returned equal values and their virtual runtimes are within
+     :paramref:`tolerance` of each other.
+    :param float tolerance: the relative tolerance of the virtual runtime
+    :param int max_workers: the maximum number of processes to use
+    :param args: the arguments to pass to the workload
+    :param kwargs: the keyword arguments to pass to the workload
+    :returns: an instance of :class:`hiro.measurement.Sweep`
+    """
+    compare = compare or _equivalent(tolerance)
+    factors = sorted(factors)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as pool:
+        reference = pool.submit(_run_at_factor, reference_factor, fn, args, kwargs)
+        futures = {
+            factor: pool.submit(_run_at_factor, factor, fn, args, kwargs)
+            for factor in factors
+        }
+        reference = reference.result()
+        segments = {factor: future.result() for factor, future in futures.items()}
+
+    return Sweep(
+        reference,
+        segments,
+        {factor: compare(reference, segments[factor]) for factor in factors},
+    )
@@ -0,0 +1,110 @@
+"""
+propagation of an active :class:`hiro.Timeline` to python subprocesses
+
+A timeline created with ``propagate=True`` serializes its state into the
+:data:`ENVIRON_KEY` environment variable while it is active and prepends
+a directory containing a ``sitecustomize`` module to ``PYTHONPATH``.
+Python interpreters started from the context (through :mod:`subprocess`
+or :mod:`multiprocessing` with the ``spawn`` or ``forkserver`` start
+methods) call :func:`process_startup` before any user code is imported and
+enter an equivalent timeline for their whole lifetime.
+
+If ``PYTHONPATH`` can not be used (for example in isolated interpreters)
+a ``.pth`` file in ``site-packages`` with the following content achieves
+the same::
+
+    import hiro.propagation; hiro.propagation.process_startup()
+"""
+import atexit
+import json
+import os
+
+#: environment variable holding the serialized timeline
+ENVIRON_KEY = "HIRO_TIMELINE"
+STARTUP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_startup")
+
+_active = None
+
+
+def dumps(timeline):
+    """
+    serializes the state of ``timeline``
+    """
+    reference, offset, factor, freeze_point = timeline._get_state()
+    scoping = {
+        key: dict(value) if key == "factors" else list(value)
+        for key, value in timeline.scoping.items()
+        if value
+    }
+
+    return json.dumps(
+        {
+            "reference": reference,
+            "offset": offset,
+            "factor": factor,
+            "freeze_point": freeze_point,
+            "scoping": scoping,
+        }
+    )
+
+
+def loads(value, propagate=True):
+    """
+    creates a :class:`hiro.Timeline` from the output of :func:`dumps`
+    """
+    from .core import Timeline
+
+    state = json.loads(value)
+    timeline = Timeline(scale=state["factor"], propagate=propagate, **state["scoping"])
+    timeline.reference = state["reference"]
+    timeline.offset = state["offset"]
+    timeline.freeze_point = state["freeze_point"]
+
+    return timeline
+
+
+def export(timeline):
+    """
+    publishes ``timeline`` to subprocesses started from now on
+
+    :returns: the previous values of the environment variables that were
+     changed, to be passed to :func:`restore`
+    """
+    previous = {key: os.environ.get(key) for key in (ENVIRON_KEY, "PYTHONPATH")}
+    os.environ[ENVIRON_KEY] = dumps(timeline)
+    paths = os.environ.get("PYTHONPATH", "").split(os.pathsep)
+
+    if STARTUP_PATH not in paths:
+        os.environ["PYTHONPATH"] = os.pathsep.join(
+            [STARTUP_PATH] + [path for path in paths if path]
+        )
+
+    return previous
+
+
+def restore(previous):
+    """
+    reverts the environment changes made by :func:`export`
+    """
+
+    for key, value in previous.items():
+        if value is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
+
+
+def process_startup():
+    """
+    enters the timeline serialized in :data:`ENVIRON_KEY` (if any) for the
+    rest of the lifetime of the interpreter.
+
+    :returns: the active :class:`hiro.Timeline` or ``None``
+    """
+    global _active
+
+    if _active is None and os.environ.get(ENVIRON_KEY):
+        _active = loads(os.environ[ENVIRON_KEY]).__enter__()
+        atexit.register(_active.__exit__, None, None, None)
+
+    return _active
@@ -0,0 +1,197 @@
+"""
+pytest plugin providing a ``timeline`` fixture and marker.
+
+The plugin is registered through the ``pytest11`` entry point when hiro is
+installed.
+
+.. code-block:: python
+
+    def test_expiry(timeline):
+        timeline.forward(3600)
+        ...
+
+    @pytest.mark.timeline(scale=100, start=datetime.datetime(2012, 12, 12))
+    def test_retries(timeline):
+        time.sleep(60)  # effectively 0.6 seconds
+        ...
+
+    @pytest.mark.timeline(frozen=True)
+    def test_frozen():
+        ...
+
+A single :class:`hiro.Timeline` is created per session (i.e. per worker
+process when running with ``pytest-xdist``) and is reset before every test.
+The modules that need to be patched are discovered once and cached in a
+:class:`hiro.core.PatchSites` instance, so that each test only pays for
+modules imported since the previous one. Nothing is shared between
+processes.
+
+Running pytest with ``--hiro-report`` adds a report of the cost of hiro
+to the terminal summary. For every test that used a timeline it lists the
+time spent entering and exiting it, the number of patched module
+attributes, the number of reads of patched clocks and the real time saved
+by scaled sleeps, ordered by the time spent entering and exiting
+(``--hiro-report-limit`` controls how many tests are listed).
+"""
+import collections
+
+import pytest
+
+from .core import PatchSites, Timeline
+from .counters import TimelineCounters
+from .utils import time_in_seconds
+
+TimelineCost = collections.namedtuple(
+    "TimelineCost", "nodeid enter exit patch_sites clock_reads sleep_saved"
+)
+TimelineCost.__doc__ = """
+cost of the timeline of a single test as collected by :class:`HiroReport`
+"""
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("hiro")
+    group.addoption(
+        "--hiro-report",
+        action="store_true",
+        default=False,
+        help="report the cost of hiro for each test using a timeline",
+    )
+    group.addoption(
+        "--hiro-report-limit",
+        type=int,
+        default=20,
+        metavar="N",
+        help="number of tests listed in the hiro report (0 for all). "
+        "default: %(default)s",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "timeline(scale=1, start=None, frozen=False): run the test within a "
+        "hiro timeline (available as the 'timeline' fixture)",
+    )
+
+    if config.getoption("hiro_report", False):
+        config.pluginmanager.register(HiroReport(config), HiroReport.name)
+
+
+class HiroReport:
+    """
+    collects a :class:`TimelineCost` for every test that uses a timeline and
+    writes them to the terminal summary
+    """
+
+    name = "hiro-report"
+
+    def __init__(self, config):
+        self.limit = config.getoption("hiro_report_limit")
+        self.costs = []
+
+    def pytest_terminal_summary(self, terminalreporter):
+        write = terminalreporter.write_line
+        terminalreporter.write_sep("=", "hiro report")
+
+        if not self.costs:
+            write("no test used a timeline")
+            return
+        costs = sorted(self.costs, key=lambda cost: cost.enter + cost.exit)
+        costs.reverse()
+
+        if self.limit:
+            costs = costs[: self.limit]
+        write(
+            "%10s %10s %6s %10s %16s  %s"
+            % ("enter (ms)", "exit (ms)", "sites", "reads", "sleep saved (s)", "test")
+        )
+
+        for cost in costs:
+            write(
+                "%10.3f %10.3f %6d %10d %16.3f  %s"
+                % (
+                    cost.enter * 1e3,
+                    cost.exit * 1e3,
+                    cost.patch_sites,
+                    cost.clock_reads,
+                    cost.sleep_saved,
+                    cost.nodeid,
+                )
+            )
+        write(
+            "%d tests used a timeline: %.3f ms entering, %.3f ms exiting, "
+            "%d clock reads, %.3f s of sleep saved"
+            % (
+                len(self.costs),
+                sum(cost.enter for cost in self.costs) * 1e3,
+                sum(cost.exit for cost in self.costs) * 1e3,
+                sum(cost.clock_reads for cost in self.costs),
+                sum(cost.sleep_saved for cost in self.costs),
+            )
+        )
+
+
+@pytest.fixture(scope="session")
+def _hiro_session_timeline():
+    return Timeline(sites=PatchSites())
+
+
+def _configure(timeline, scale=1, start=None, frozen=False):
+    """
+    applies the arguments of the ``timeline`` marker to a freshly reset
+    ``timeline``
+    """
+
+    if start is not None:
+        if frozen:
+            timeline.freeze(start)
+        else:
+            timeline.forward(time_in_seconds(start) - timeline.reference)
+    elif frozen:
+        timeline.freeze()
+
+    if scale != 1:
+        timeline.scale(scale)
+
+
+@pytest.fixture
+def timeline(request, _hiro_session_timeline):
+    """
+    the :class:`hiro.Timeline` the test runs in, configured with the
+    arguments of the ``timeline`` marker if the test has one
+    """
+    marker = request.node.get_closest_marker("timeline")
+    timeline = _hiro_session_timeline.reset()
+
+    if marker is not None:
+        _configure(timeline, *marker.args, **marker.kwargs)
+    report = request.config.pluginmanager.get_plugin(HiroReport.name)
+
+    if report is None:
+        with timeline:
+            yield timeline
+
+        return
+    timeline.counters = counters = TimelineCounters()
+    try:
+        with timeline:
+            yield timeline
+    finally:
+        timeline.counters = None
+        report.costs.append(
+            TimelineCost(
+                request.node.nodeid,
+                counters.enter_time,
+                counters.exit_time,
+                counters.patch_sites,
+                sum(counters.reads.values()),
+                counters.sleep_saved,
+            )
+        )
+
+
+@pytest.fixture(autouse=True)
+def _hiro_marker(request):
+    if request.node.get_closest_marker("timeline") is not None:
+        request.getfixturevalue("timeline")
@@ -0,0 +1,226 @@
+"""
+module scoping rules for :class:`hiro.Timeline`
+"""
+import weakref
+
+
+class _Rule:
+    """
+    marker values stored in a :class:`ModuleRules` trie
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+#: the module keeps the real clock and is never patched
+EXCLUDED = _Rule("EXCLUDED")
+#: the module follows the factor of the enclosing :class:`hiro.Timeline`
+DEFAULT = _Rule("DEFAULT")
+
+
+class _Node:
+    __slots__ = ("children", "rule")
+
+    def __init__(self):
+        self.children = {}
+        self.rule = None
+
+
+class ModuleRules:
+    """
+    prefix trie over dotted module names mapping packages to either
+    :data:`EXCLUDED`, :data:`DEFAULT` or a numeric scale factor.
+
+    The most specific rule wins, i.e. a factor for ``requests.adapters``
+    overrides one for ``requests``, except that an excluded package
+    excludes everything below it. Lookups stop as soon as an excluded
+    package is reached so that whole sub trees are skipped cheaply.
+
+    :param default: the rule applied to modules that match no prefix
+    """
+
+    def __init__(self, default=DEFAULT):
+        self.root = _Node()
+        self.default = default
+        self.__cache = {}
+
+    @classmethod
+    def from_config(cls, include=None, exclude=None, factors=None):
+        """
+        builds the rules from the arguments accepted by :class:`hiro.Timeline`
+
+        :param include: package names to patch. If provided, every other
+         module keeps the real clock.
+        :param exclude: package names that keep the real clock
+        :param factors: mapping of package names to scale factors
+        :returns: an instance of :class:`ModuleRules` or ``None`` if no rules
+         were provided.
+        """
+
+        if not (include or exclude or factors):
+            return None
+        rules = cls(default=EXCLUDED if include else DEFAULT)
+
+        for name in include or ():
+            rules.add(name, DEFAULT)
+
+        for name, factor in (factors or {}).items():
+            rules.add(name, factor)
+
+        for name in exclude or ():
+            rules.add(name, EXCLUDED)
+
+        return rules
+
+    def add(self, name, rule):
+        """
+        registers ``rule`` for the package or module ``name``
+        """
+        node = self.root
+
+        for part in name.split("."):
+            node = node.children.setdefault(part, _Node())
+        node.rule = rule
+        self.__cache.clear()
+
+    def rules(self):
+        """
+        :returns: a list of ``(name, rule)`` tuples for every registered
+         package or module
+        """
+        rules = []
+        pending = [("", self.root)]
+
+        while pending:
+            prefix, node = pending.pop()
+
+            for part, child in node.children.items():
+                name = prefix + part
+
+                if child.rule is not None:
+                    rules.append((name, child.rule))
+                pending.append((name + ".", child))
+
+        return sorted(rules, key=lambda rule: rule[0])
+
+    def lookup(self, name):
+        """
+        :returns: the most specific rule registered for the module ``name``
+        """
+
+        try:
+            return self.__cache[name]
+        except KeyError:
+            pass
+        rule = self.default
+        node = self.root
+
+        for part in name.split("."):
+            node = node.children.get(part)
+
+            if node is None:
+                break
+
+            if node.rule is not None:
+                rule = node.rule
+
+                if rule is EXCLUDED:
+                    break
+        self.__cache[name] = rule
+
+        return rule
+
+
+class IgnoredModules:
+    """
+    registry of the modules that :class:`hiro.Timeline` never scans or
+    patches, together with the reason they are skipped.
+
+    Modules are held through weak references, so unloaded (e.g. reloaded)
+    modules do not accumulate in long running processes. In addition whole
+    packages can be excluded by name with :meth:`add_prefix`. The registry
+    used by hiro is :data:`hiro.core.IGNORED_MODULES`.
+
+    .. code-block:: python
+
+        from hiro.core import IGNORED_MODULES
+
+        IGNORED_MODULES.add_prefix("plugins", "reloaded at runtime")
+        for name, reason in IGNORED_MODULES.entries():
+            print(name, reason)
+    """
+
+    def __init__(self):
+        self.__modules = weakref.WeakKeyDictionary()
+        #: objects that do not support weak references (e.g. placeholders
+        #: left in sys.modules) mapped by id to the object and the reason
+        self.__others = {}
+        self.__prefixes = ModuleRules(default=None)
+
+    def add(self, module, reason="ignored"):
+        """
+        ignores ``module`` for the given ``reason``
+        """
+        try:
+            self.__modules[module] = reason
+        except TypeError:
+            self.__others[id(module)] = (module, reason)
+
+    def add_prefix(self, name, reason="excluded by prefix"):
+        """
+        ignores the package or module ``name`` and every module below it
+        """
+        self.__prefixes.add(name, reason)
+
+    def reason(self, module, name=None):
+        """
+        :param module: the module object
+        :param str name: the name of the module in :data:`sys.modules`
+        :returns: the reason the module is ignored or ``None`` if it is not
+        """
+        try:
+            reason = self.__modules.get(module)
+        except TypeError:
+            reason = self.__others.get(id(module), (None, None))[1]
+
+        if reason is None and name is not None:
+            reason = self.__prefixes.lookup(name)
+
+        return reason
+
+    def __contains__(self, module):
+        return self.reason(module) is not None
+
+    def __len__(self):
+        return len(self.__modules) + len(self.__others)
+
+    def entries(self):
+        """
+        :returns: a list of ``(name, reason)`` tuples for every ignored
+         module that is still alive and every ignored prefix (whose name
+         ends with ``.*``)
+        """
+        entries = [
+            (getattr(module, "__name__", repr(module)), reason)
+            for module, reason in list(self.__modules.items())
+        ]
+        entries.extend(
+            (repr(module), reason) for module, reason in self.__others.values()
+        )
+        entries.extend(
+            (name + ".*", reason) for name, reason in self.__prefixes.rules()
+        )
+
+        return entries
+
+    def clear(self):
+        """
+        removes all modules and prefixes from the registry
+        """
+        self.__modules.clear()
+        self.__others.clear()
+        self.__prefixes = ModuleRules(default=None)
@@ -0,0 +1,84 @@
+"""
+sampling of the callers of the clocks patched by a :class:`hiro.Timeline`
+"""
+import collections
+import sys
+
+#: modules whose frames are skipped to find the caller of a clock
+_SKIPPED = (__package__ + ".core", __package__ + ".patches")
+
+
+class CallSiteSampler:
+    """
+    samples the callers of the clocks patched by a :class:`hiro.Timeline`
+    (including :func:`time.sleep` and the :mod:`datetime` classes) while it
+    is assigned to :attr:`hiro.Timeline.sampler` (see the
+    :paramref:`hiro.Timeline.sample_every` argument).
+
+    The call site (``(filename, lineno)``) of every :paramref:`every`-th
+    call is counted, which makes loops that read the clock once per item
+    stand out.
+
+    :param int every: sample one in every ``every`` calls
+    :param int max_sites: the maximum number of distinct call sites kept.
+     Samples of call sites seen once the table is full are only counted in
+     :attr:`dropped`.
+    """
+
+    __slots__ = ("every", "max_sites", "calls", "sites", "dropped")
+
+    def __init__(self, every=100, max_sites=1000):
+        self.every = every
+        self.max_sites = max_sites
+        self.calls = 0
+        self.sites = {}
+        self.dropped = 0
+
+    def sample(self):
+        """
+        counts a call made to a patched clock
+        """
+        self.calls += 1
+
+        if self.calls % self.every:
+            return
+        frame = sys._getframe(1)
+
+        while frame is not None and frame.f_globals.get("__name__") in _SKIPPED:
+            frame = frame.f_back
+
+        if frame is None:
+            return
+        site = (frame.f_code.co_filename, frame.f_lineno)
+        count = self.sites.get(site)
+
+        if count is None and len(self.sites) >= self.max_sites:
+            self.dropped += 1
+        else:
+            self.sites[site] = (count or 0) + 1
+
+    def top(self, count=10):
+        """
+        :returns: the ``count`` most sampled call sites as a list of
+         ``((filename, lineno), samples)`` tuples
+        """
+
+        return collections.Counter(self.sites).most_common(count)
+
+    def dump(self, count=10, file=None):
+        """
+        writes the ``count`` most sampled call sites with the number of
+        samples and the estimated number of calls to ``file``
+        (:data:`sys.stderr` by default)
+        """
+        file = file if file is not None else sys.stderr
+        print("%8s %12s  %s" % ("samples", "est. calls", "call site"), file=file)
+
+        for (filename, lineno), samples in self.top(count):
+            print(
+                "%8d %12d  %s:%d" % (samples, samples * self.every, filename, lineno),
+                file=file,
+            )
+
+        if self.dropped:
+            print("%8d samples of other call sites dropped" % self.dropped, file=file)
@@ -0,0 +1,249 @@
+"""
+timeline whose state is shared between processes
+"""
+import contextlib
+import functools
+import math
+import mmap
+import os
+import struct
+import threading
+
+from .core import Timeline
+from .errors import SharedTimelineError
+
+_MAGIC = b"HIRO"
+_VERSION = 1
+#: magic, version & pid of the writing process
+_HEADER = struct.Struct("=4sHxxQ")
+_SEQUENCE = struct.Struct("=Q")
+#: sequence counter followed by reference, offset, factor & freeze point
+_STATE = struct.Struct("=Qdddd")
+_FIELD = struct.Struct("=d")
+_SIZE = _HEADER.size + _STATE.size
+#: number of attempts made by a reader before giving up on a segment
+#: whose writer never completes an update (e.g. because it died)
+_MAX_READ_ATTEMPTS = 1000
+
+
+def _transactional(method):
+    """
+    publishes all state changes made by ``method`` as a single update
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._transaction():
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+def _shared_field(index):
+    def getter(self):
+        return self._get_state()[index]
+
+    def setter(self, value):
+        self._set_state(index, value)
+
+    return property(getter, setter)
+
+
+class SharedTimeline(Timeline):
+    """
+    :class:`hiro.Timeline` that keeps :attr:`reference`, :attr:`offset`,
+    :attr:`factor` and :attr:`freeze_point` in a memory mapped segment so that
+    every process attached to it follows the same virtual clock.
+
+    The segment is guarded by a seqlock: reads never take a lock and are
+    retried (with a short backoff) if they overlap with a write, while calls
+    to :meth:`forward`, :meth:`rewind`, :meth:`freeze`, :meth:`unfreeze`,
+    :meth:`scale` and :meth:`reset` are published atomically to all readers.
+
+    .. note:: Only the process that created the timeline may alter it. The
+       segment records the pid of that process and alterations made from
+       any other process raise :class:`hiro.errors.SharedTimelineError`.
+
+    Without a :paramref:`path` the segment is anonymous and is shared with
+    processes forked after the timeline was created (for example pre-fork
+    workers). With a :paramref:`path` unrelated processes can use
+    :meth:`attach` to follow the timeline.
+
+    .. code-block:: python
+
+        timeline = SharedTimeline(scale=10, path="/dev/shm/hiro")
+
+        # in a worker process
+        with SharedTimeline.attach("/dev/shm/hiro"):
+            ...
+
+    :param str path: optional file to back the shared segment with
+    :param bool attach: if ``True`` the state already present in the segment
+        at :paramref:`path` is used instead of being initialized from
+        :paramref:`scale` and :paramref:`start`. The segment must already
+        have been initialized by the controlling process.
+    """
+
+    reference = _shared_field(0)
+    offset = _shared_field(1)
+    factor = _shared_field(2)
+    freeze_point = _shared_field(3)
+
+    def __init__(self, scale=1, start=None, path=None, attach=False, **kwargs):
+        self.__lock = threading.RLock()
+        self.__writer = None
+        self.__segment = None
+        self.__pending = [0.0, 0.0, 1.0, None]
+
+        if not attach and not scale:
+            raise ValueError("scale must be non zero")
+        super().__init__(scale=scale, start=start, **kwargs)
+        self.path = path
+
+        if path is None:
+            self.__segment = mmap.mmap(-1, _SIZE)
+        elif attach:
+            fd = os.open(path, os.O_RDWR)
+            try:
+                if os.fstat(fd).st_size < _SIZE:
+                    raise SharedTimelineError(
+                        "%s is not an initialized hiro timeline" % path
+                    )
+                self.__segment = mmap.mmap(fd, _SIZE)
+            finally:
+                os.close(fd)
+        else:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                os.ftruncate(fd, _SIZE)
+                self.__segment = mmap.mmap(fd, _SIZE)
+            finally:
+                os.close(fd)
+
+        pending, self.__pending = self.__pending, None
+
+        if attach:
+            self.__validate()
+        else:
+            _HEADER.pack_into(self.__segment, 0, b"", 0, os.getpid())
+            with self._transaction():
+                for index, value in enumerate(pending):
+                    self._set_state(index, value)
+            # only publish the header once the state is complete so that
+            # processes attaching concurrently never see a partial segment
+            _HEADER.pack_into(self.__segment, 0, _MAGIC, _VERSION, os.getpid())
+
+    forward = _transactional(Timeline.forward)
+    rewind = _transactional(Timeline.rewind)
+    freeze = _transactional(Timeline.freeze)
+    unfreeze = _transactional(Timeline.unfreeze)
+    scale = _transactional(Timeline.scale)
+    reset = _transactional(Timeline.reset)
+
+    @classmethod
+    def attach(cls, path, **kwargs):
+        """
+        returns a :class:`SharedTimeline` following the state published
+        at :paramref:`path` by another process.
+        """
+
+        return cls(path=path, attach=True, **kwargs)
+
+    def _after_fork(self):
+        # the lock may have been held by a thread that does not exist
+        # in the child
+        self.__lock = threading.RLock()
+        self.__writer = None
+        super()._after_fork()
+
+    def _rebase(self):
+        # the shared state is owned by the controlling process
+        pass
+
+    def __validate(self):
+        magic, version, _ = _HEADER.unpack_from(self.__segment)
+
+        if magic != _MAGIC or version != _VERSION:
+            self.close()
+            raise SharedTimelineError(
+                "%s is not an initialized hiro timeline" % self.path
+            )
+
+        if not self.factor:
+            self.close()
+            raise SharedTimelineError("%s has a scale factor of 0" % self.path)
+
+    def close(self):
+        """
+        unmaps the shared segment
+        """
+
+        if self.__segment is not None:
+            self.__segment.close()
+            self.__segment = None
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """
+        publishes all state changes made within the context as a single
+        update of the seqlock
+        """
+
+        with self.__lock:
+            if self.__writer is not None:
+                yield
+                return
+            _, _, owner = _HEADER.unpack_from(self.__segment)
+
+            if owner != os.getpid():
+                raise SharedTimelineError(
+                    "only the process that created the timeline (%d) "
+                    "can alter it" % owner
+                )
+            (sequence,) = _SEQUENCE.unpack_from(self.__segment, _HEADER.size)
+            _SEQUENCE.pack_into(self.__segment, _HEADER.size, sequence + 1)
+            self.__writer = threading.get_ident()
+            try:
+                yield
+            finally:
+                self.__writer = None
+                _SEQUENCE.pack_into(self.__segment, _HEADER.size, sequence + 2)
+
+    def _get_state(self):
+        if self.__pending is not None:
+            return tuple(self.__pending)
+        owned = self.__writer == threading.get_ident()
+
+        for attempt in range(_MAX_READ_ATTEMPTS):
+            sequence, *state = _STATE.unpack_from(self.__segment, _HEADER.size)
+
+            if owned:
+                break
+
+            if not sequence & 1 and (
+                _SEQUENCE.unpack_from(self.__segment, _HEADER.size)[0] == sequence
+            ):
+                break
+            # back off from a writer that is in the middle of an update
+            self._get_original("time.sleep")(min(1e-6 * 2**attempt, 1e-3))
+        else:
+            raise SharedTimelineError(
+                "timed out waiting for an update of the shared timeline"
+            )
+
+        if math.isnan(state[3]):
+            state[3] = None
+
+        return tuple(state)
+
+    def _set_state(self, index, value):
+        if self.__pending is not None:
+            self.__pending[index] = value
+            return
+
+        with self._transaction():
+            _FIELD.pack_into(
+                self.__segment,
+                _HEADER.size + _SEQUENCE.size + _FIELD.size * index,
+                float("nan") if value is None else value,
+            )
@@ -0,0 +1,114 @@
+"""
+recording of the activity of a :class:`hiro.Timeline` as a chrome trace
+"""
+import collections
+import json
+import os
+import threading
+import time
+
+
+class TimelineTracer:
+    """
+    records the activity of a :class:`hiro.Timeline` (entering and exiting
+    it, :meth:`~hiro.Timeline.forward`, :meth:`~hiro.Timeline.rewind`,
+    :meth:`~hiro.Timeline.freeze`, :meth:`~hiro.Timeline.unfreeze`,
+    :meth:`~hiro.Timeline.scale`, :meth:`~hiro.Timeline.reset` and every
+    sleep) while it is assigned to :attr:`hiro.Timeline.tracer` (see the
+    :paramref:`hiro.Timeline.trace` argument).
+
+    Events are kept in a ring buffer of :paramref:`size` entries and are
+    only serialized by :meth:`write` (which the timeline calls when it is
+    exited) in the `chrome trace event format
+    <https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU>`_
+    understood by ``chrome://tracing`` and https://ui.perfetto.dev. Real
+    and virtual time are written as two separate processes so that each
+    event appears once on each clock.
+
+    :param str path: the file the trace is written to
+    :param int size: the maximum number of events kept
+    """
+
+    __slots__ = ("path", "events", "real_start", "virtual_start")
+
+    #: pids of the real and virtual time tracks
+    REAL, VIRTUAL = 1, 2
+
+    def __init__(self, path, size=65536, virtual_start=0.0):
+        self.path = path
+        self.events = collections.deque(maxlen=size)
+        self.real_start = time.perf_counter()
+        self.virtual_start = virtual_start
+
+    def record(self, name, virtual_time, virtual_duration=None, start=None, **args):
+        """
+        records the event ``name`` that happened at ``virtual_time``. If
+        ``start`` (a :func:`time.perf_counter` value) is provided the event
+        is a span that started at ``start`` and lasted for
+        ``virtual_duration`` seconds of virtual time.
+        """
+        end = time.perf_counter()
+        self.events.append(
+            (
+                name,
+                threading.get_ident(),
+                end if start is None else start,
+                None if start is None else end - start,
+                virtual_time,
+                virtual_duration,
+                args,
+            )
+        )
+
+    def to_json(self):
+        """
+        :returns: the events as a chrome trace :class:`dict`
+        """
+        pid = os.getpid()
+        trace = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": track,
+                "tid": 0,
+                "args": {"name": "%s time (%d)" % (label, pid)},
+            }
+            for track, label in ((self.REAL, "real"), (self.VIRTUAL, "virtual"))
+        ]
+
+        for (
+            name,
+            thread,
+            real,
+            real_duration,
+            virtual,
+            virtual_duration,
+            args,
+        ) in self.events:
+            for track, timestamp, duration in (
+                (self.REAL, real - self.real_start, real_duration),
+                (self.VIRTUAL, virtual - self.virtual_start, virtual_duration),
+            ):
+                event = {
+                    "name": name,
+                    "pid": track,
+                    "tid": thread,
+                    "ts": timestamp * 1e6,
+                    "args": args,
+                }
+
+                if duration is None:
+                    event.update(ph="i", s="t")
+                else:
+                    event.update(ph="X", dur=duration * 1e6)
+                trace.append(event)
+
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def write(self):
+        """
+        writes the recorded events to :attr:`path`
+        """
+
+        with open(self.path, "w") as trace:
+            json.dump(self.to_json(), trace)
@@ -4,11 +4,13 @@ random utility functions
 import calendar
 import datetime
 import functools
+import statistics
 import time
 
 from .errors import InvalidTypeError
 
 utc = datetime.timezone.utc
+_minimum_sleep = None
 
 
 def timedelta_to_seconds(delta):
@@ -64,3 +66,27 @@ def chained(method):
         return self if result is None else result
 
     return wrapper
+
+
+def minimum_sleep(sleep=None, samples=25):
+    """
+    measures (once per process) the shortest real duration a call to
+    :func:`time.sleep` takes on this platform, i.e. the per call syscall
+    and scheduler overhead.
+
+    :param sleep: the (unpatched) sleep function to calibrate
+    :param int samples: the number of sleeps to take the median of
+    """
+    global _minimum_sleep
+
+    if _minimum_sleep is None:
+        sleep = sleep or time.sleep
+        durations = []
+
+        for _ in range(samples):
+            start = time.perf_counter()
+            sleep(1e-6)
+            durations.append(time.perf_counter() - start)
+        _minimum_sleep = statistics.median(durations)
+
+    return _minimum_sleep
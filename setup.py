@@ -34,5 +34,7 @@ setup(
     classifiers=[k for k in open('CLASSIFIERS').read().split('\n') if k],
     description='time manipulation utilities for testing in python',
     long_description=open('README.rst').read() + open('HISTORY.rst').read(),
-    packages=["hiro"]
+    packages=["hiro"],
+    package_data={"hiro": ["_startup/*.py"]},
+    entry_points={"pytest11": ["hiro = hiro.pytest_plugin"]},
 )
@@ -0,0 +1,22 @@
+"""
+
+"""
+import functools
+import sched
+import time
+from datetime import datetime as dt
+from time import time as now
+
+__all__ = ["Clock", "dt", "now", "read", "scheduler", "stopwatch"]
+
+
+class Clock:
+    read = time.time
+
+
+def read(clock=time.time, *, sleep=time.sleep):
+    return clock()
+
+
+stopwatch = functools.partial(time.monotonic)
+scheduler = sched.scheduler(time.time, time.sleep)
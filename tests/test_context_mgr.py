@@ -1,12 +1,24 @@
+import asyncio
+import inspect
+import io
+import json
+import logging
 import math
 import os
+import sys
+import threading
 import time
+import unittest
 from datetime import date, datetime, timedelta
+from time import time as time_time
 from unittest import mock
 
 import pytest
 
+import hiro
 from hiro import Timeline
+from hiro.counters import TimelineCounters
+from hiro.rules import IgnoredModules
 from hiro.utils import timedelta_to_seconds
 from tests.emulated_modules import sample_1, sample_2, sample_3
 
@@ -235,7 +247,118 @@ def test_decorated_exception():
         _decorated()
 
 
-@mock.patch("hiro.core.IGNORED_MODULES", new_callable=set)
+def test_decorated_coroutine():
+    @Timeline(scale=100)
+    async def _decorated(timeline):
+        assert isinstance(timeline, Timeline)
+        start = time.time()
+        await asyncio.sleep(0)
+        time.sleep(10)
+
+        return time.time() - start
+
+    real_start = time.time()
+    assert asyncio.run(_decorated()) >= 10
+    assert time.time() - real_start < 10
+
+
+def test_decorated_generator():
+    @Timeline(scale=100)
+    def _decorated(count):
+        for _ in range(count):
+            time.sleep(10)
+            yield time.time()
+        return "done"
+
+    real_start = time.time()
+    generator = _decorated(3)
+    ticks = [next(generator), next(generator), next(generator)]
+    assert ticks[2] - ticks[0] >= 20
+
+    with pytest.raises(StopIteration) as exc:
+        next(generator)
+    assert exc.value.value == "done"
+    assert time.time() - real_start < 10
+
+
+def test_decorated_async_generator():
+    @Timeline(scale=100)
+    async def _decorated(count):
+        for _ in range(count):
+            await asyncio.sleep(0)
+            time.sleep(10)
+            yield time.time()
+
+    async def _collect():
+        return [tick async for tick in _decorated(3)]
+
+    real_start = time.time()
+    ticks = asyncio.run(_collect())
+    assert ticks[2] - ticks[0] >= 20
+    assert time.time() - real_start < 10
+
+
+def test_decorated_class():
+    @Timeline(scale=100)
+    class _Decorated:
+        calls = []
+
+        @classmethod
+        def setup_class(cls):
+            cls.calls.append("setup")
+
+        def test_first(self, timeline):
+            assert isinstance(timeline, Timeline)
+            time.sleep(10)
+
+        def test_second(self):
+            time.sleep(10)
+
+        @classmethod
+        def teardown_class(cls):
+            cls.calls.append("teardown")
+
+    assert "timeline" not in inspect.signature(_Decorated.test_first).parameters
+
+    with mock.patch.object(
+        Timeline, "__enter__", autospec=True, side_effect=Timeline.__enter__
+    ) as enter:
+        real_start = time.time()
+        _Decorated.setup_class()
+        try:
+            start = time.time()
+            _Decorated().test_first()
+            _Decorated().test_second()
+            assert time.time() - start >= 20
+        finally:
+            _Decorated.teardown_class()
+    assert enter.call_count == 1
+    assert _Decorated.calls == ["setup", "teardown"]
+    assert time.time() - real_start < 10
+
+
+def test_decorated_test_case():
+    @Timeline(scale=100)
+    class _Decorated(unittest.TestCase):
+        def test_sleep(self, timeline):
+            self.assertIsInstance(timeline, Timeline)
+            start = time.time()
+            time.sleep(10)
+            self.assertGreaterEqual(time.time() - start, 10)
+
+    with mock.patch.object(
+        Timeline, "__enter__", autospec=True, side_effect=Timeline.__enter__
+    ) as enter:
+        real_start = time.time()
+        result = unittest.TextTestRunner(stream=io.StringIO()).run(
+            unittest.defaultTestLoader.loadTestsFromTestCase(_Decorated)
+        )
+    assert result.wasSuccessful()
+    assert enter.call_count == 1
+    assert time.time() - real_start < 10
+
+
+@mock.patch("hiro.core.IGNORED_MODULES", new_callable=IgnoredModules)
 def test_patch_ignored_modules(IGNORED_MODULES):
     hiro_dummy_module = mock.MagicMock(__dir__=mock.MagicMock(side_effect=Exception))
 
@@ -248,3 +371,487 @@ def test_patch_ignored_modules(IGNORED_MODULES):
 
         hiro_dummy_module.__dir__.assert_called_once()
         assert hiro_dummy_module in IGNORED_MODULES
+        assert IGNORED_MODULES.reason(hiro_dummy_module).startswith("scan failed")
+
+
+@mock.patch("hiro.core.IGNORED_MODULES", new_callable=IgnoredModules)
+def test_ignored_prefix(IGNORED_MODULES):
+    IGNORED_MODULES.add_prefix("tests.emulated_modules.sub_module_2")
+
+    with Timeline().freeze(0):
+        assert sample_1.sub_module_1.sub_sample_1_1_now().year == 1970
+        # names imported from datetime are not patched in ignored modules
+        assert sample_2.sub_module_2.sub_sample_2_1_now().year > 1970
+
+
+def test_exclude_modules():
+    real = time.time()
+    with Timeline(exclude=["tests.emulated_modules.sub_module_3"]).forward(3600):
+        assert sample_3.sub_module_3.sub_sample_3_1_time() - real < 60
+        assert sample_2.sub_module_2.sub_sample_2_1_time() - real >= 3600
+        assert sample_1.sub_module_1.sub_sample_1_1_time() - real >= 3600
+        now = sample_3.sub_module_3.sub_sample_3_1_now()
+        assert timedelta_to_seconds(datetime.now() - now) > 3590
+
+
+def test_include_modules():
+    real = time.time()
+    with Timeline(include=["tests.emulated_modules.sub_module_2"]).forward(3600):
+        assert time.time() - real < 60
+        assert sample_2.sub_module_2.sub_sample_2_1_time() - real >= 3600
+        assert sample_3.sub_module_3.sub_sample_3_1_time() - real < 60
+        now = sample_2.sub_module_2.sub_sample_2_1_now()
+        assert timedelta_to_seconds(now - datetime.now()) > 3590
+        now = sample_1.sub_module_1.sub_sample_1_1_now()
+        assert abs(timedelta_to_seconds(now - datetime.now())) < 60
+
+
+def test_excluded_modules_not_scanned():
+    timeline = Timeline(include=["nonexistent_pkg"], stats=True)
+
+    with timeline:
+        pass
+    assert timeline.stats()["modules_scanned"] == 0
+
+
+def test_module_factors():
+    start = time.time()
+    with Timeline(
+        factors={
+            "tests.emulated_modules.sub_module_2": 1000,
+            "tests.emulated_modules.sub_module_3": 100,
+        }
+    ):
+        sample_3.sub_module_3.sub_sample_3_1_sleep(10)
+        sample_2.sub_module_2.sub_sample_2_1_sleep(100)
+        assert time.time() - start < 1
+        assert sample_3.sub_module_3.sub_sample_3_1_time() - start >= 10
+        assert sample_2.sub_module_2.sub_sample_2_1_time() - start >= 100
+
+
+def test_module_factors_monotonic():
+    sub_module_2 = sample_2.sub_module_2
+    with Timeline(factors={"tests.emulated_modules.sub_module_2": 1000}) as timeline:
+        first = sub_module_2.sub_sample_2_1_time()
+        time.sleep(0.05)
+        timeline.scale(2)
+        second = sub_module_2.sub_sample_2_1_time()
+        assert second - first >= 50
+        timeline.freeze()
+        frozen = sub_module_2.sub_sample_2_1_time()
+        assert frozen >= second
+        time.sleep(0.05)
+        assert sub_module_2.sub_sample_2_1_time() == frozen
+        timeline.unfreeze()
+        # sleeps of this module are now scaled by 2
+        time.sleep(0.1)
+        assert sub_module_2.sub_sample_2_1_time() - frozen >= 50
+        timeline.forward(3600)
+        assert sub_module_2.sub_sample_2_1_time() - frozen >= 3650
+
+
+def test_excluded_stdlib_callers_use_real_clock():
+    real = time.time()
+    with Timeline(exclude=["logging"]).forward(3600):
+        record = logging.LogRecord("hiro", logging.INFO, __file__, 1, "", (), None)
+        assert abs(record.created - real) < 60
+        assert time.time() - real >= 3600
+
+
+def _time_in_forked_child(timeline):
+    read, write = os.pipe()
+    pid = os.fork()
+
+    if pid == 0:  # pragma: no cover
+        try:
+            os.write(write, repr((time.time(), time.time is time_time)).encode())
+        finally:
+            os._exit(0)
+    os.close(write)
+    try:
+        with os.fdopen(read) as result:
+            value = eval(result.read())
+    finally:
+        assert os.waitpid(pid, 0)[1] == 0
+
+    return value
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+@pytest.mark.parametrize("on_fork", ["keep", "rebase"])
+def test_fork_keep_rebase(on_fork):
+    with Timeline(scale=10, on_fork=on_fork).forward(3600) as timeline:
+        before = time.time()
+        child_time, real_clock = _time_in_forked_child(timeline)
+        assert not real_clock
+        assert before <= child_time < time.time()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_fork_detach():
+    with Timeline(on_fork="detach").forward(3600) as timeline:
+        child_time, real_clock = _time_in_forked_child(timeline)
+        assert real_clock
+        assert time.time() - child_time >= 3590
+
+
+def test_invalid_fork_policy():
+    with pytest.raises(ValueError):
+        Timeline(on_fork="explode")
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_branch():
+    def _simulate(timeline):
+        time.sleep(60)
+        return int(time.time()), timeline.factor
+
+    with Timeline(scale=100).freeze(0) as timeline:
+        segments = timeline.branch(
+            [
+                {"forward": 3600},
+                {"unfreeze": None, "scale": 600},
+                lambda t: t.freeze(7200),
+            ],
+            lambda timeline: _simulate(timeline),
+            max_workers=2,
+        )
+        forwarded, unfrozen, frozen = [segment.response for segment in segments]
+        assert forwarded == (3600, 100)
+        assert frozen == (7200, 100)
+        # the scaled sleep may overshoot by a millisecond or two, which is
+        # about a virtual second at this factor
+        assert unfrozen in [(60, 600), (61, 600)]
+        assert time.time() == 0
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_branch_starts_at_current_instant():
+    with Timeline(scale=1000) as timeline:
+        start = time.time()
+        segments = timeline.branch(
+            [lambda t: t.freeze()] * 3, lambda: time.time(), max_workers=1
+        )
+    # each batch is forked later than the previous one, which would be
+    # several virtual seconds at this factor
+    assert all(0 <= segment.response - start < 1 for segment in segments)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_branch_error():
+    def _fail():
+        raise ValueError("foo")
+
+    segments = Timeline().branch([{}], _fail)
+    with pytest.raises(ValueError):
+        segments[0].response
+
+
+def test_scale_is_continuous():
+    with Timeline(scale=100) as timeline:
+        time.sleep(10)
+        before = time.time()
+        timeline.scale(1)
+        assert 0 <= time.time() - before < 1
+
+
+def test_budget():
+    real_start = time.time()
+    with Timeline(budget=0.5, expected_virtual=600) as timeline:
+        assert timeline.factor == 1200
+        start = time.time()
+        while time.time() - start < 600:
+            # cpu bound work that the initial factor does not account for
+            busy = time_time()
+            while time_time() - busy < 0.002:
+                pass
+            time.sleep(5)
+        assert timeline.factor != 1200
+    assert 0.25 < time.time() - real_start < 1.5
+
+
+def test_budget_arguments():
+    with pytest.raises(ValueError):
+        Timeline(budget=1)
+
+
+def test_batch_sleeps():
+    real_sleep = time.sleep
+    calls = []
+
+    def _counting_sleep(amount):
+        calls.append(amount)
+        real_sleep(amount)
+
+    with mock.patch("time.sleep", _counting_sleep):
+        with Timeline(scale=100000, batch_sleeps=True):
+            start = time_time()
+            for _ in range(10000):
+                time.sleep(0.01)
+            assert time_time() - start < 0.5
+    assert 0 < len(calls) < 1000
+    # the total requested sleep is roughly honoured
+    assert sum(calls) == pytest.approx(0.001, abs=0.001)
+
+
+def test_counters():
+    timeline = Timeline(scale=100)
+    timeline.counters = TimelineCounters()
+
+    with timeline:
+        time.time()
+        time.gmtime()
+        datetime.now()
+        time.sleep(10)
+    time.time()
+    assert timeline.counters.reads["time.time"] == 2
+    assert timeline.counters.reads["time.gmtime"] == 1
+    assert timeline.counters.sleep_requested == 10
+    assert 0.1 <= timeline.counters.sleep_real < 1
+    assert timeline.counters.sleep_saved > 9
+
+
+def test_stats():
+    assert Timeline().stats() is None
+
+    timeline = Timeline(scale=100, stats=True)
+
+    with timeline:
+        time.time()
+        time.sleep(1)
+    stats = timeline.stats()
+    assert stats["modules_scanned"] > 0
+    assert stats["patch_sites"] > 0
+    assert stats["enter_time"] > 0
+    assert stats["exit_time"] > 0
+    assert stats["reads"]["time.time"] == 1
+    assert stats["sleep_requested"] == 1
+    assert stats["sleep_real"] < 1
+
+    with timeline:
+        pass
+    assert timeline.stats()["patch_sites"] == 2 * stats["patch_sites"]
+    # the modules scanned when the timeline was first entered are cached
+    assert timeline.stats()["modules_scanned"] == stats["modules_scanned"]
+    # snapshots are not affected by later activity
+    assert stats["reads"]["time.time"] == 1
+
+
+@mock.patch("hiro.core.IGNORED_MODULES", new_callable=IgnoredModules)
+def test_stats_ignored_modules(IGNORED_MODULES):
+    IGNORED_MODULES.add(sample_1)
+
+    with Timeline(stats=True) as timeline:
+        pass
+    assert timeline.stats()["modules_ignored"] == 1
+
+
+def test_call_site_sampling():
+    timeline = Timeline(sample_every=10)
+
+    with timeline:
+        for _ in range(100):
+            time.time()
+        line = inspect.currentframe().f_lineno - 1
+
+        for _ in range(20):
+            datetime.now()
+    sites = dict(timeline.sampler.top())
+    assert sites[(__file__, line)] == 10
+    assert sum(sites.values()) == 12
+
+    output = io.StringIO()
+    timeline.sampler.dump(1, file=output)
+    assert "%s:%d" % (__file__, line) in output.getvalue()
+    assert " 100 " in output.getvalue()
+
+
+def test_call_site_sampling_bounded():
+    timeline = Timeline(sample_every=1)
+    timeline.sampler.max_sites = 1
+
+    with timeline:
+        time.time()
+        time.time()
+        time.sleep(0)
+    assert len(timeline.sampler.sites) == 1
+    assert timeline.sampler.dropped == 2
+
+
+def test_trace(tmp_path):
+    path = tmp_path / "trace.json"
+    timeline = Timeline(scale=10, trace=str(path))
+
+    with timeline:
+        timeline.forward(60)
+        time.sleep(1)
+        timeline.freeze().rewind(30).unfreeze().scale(100)
+    trace = json.loads(path.read_text())["traceEvents"]
+    tracks = {event["pid"] for event in trace}
+    assert len(tracks) == 2
+    names = [
+        event["name"] for event in trace if event["ph"] != "M" and event["pid"] == 1
+    ]
+    assert names == [
+        "enter",
+        "forward",
+        "sleep",
+        "freeze",
+        "rewind",
+        "unfreeze",
+        "scale",
+        "exit",
+    ]
+    sleeps = {event["pid"]: event for event in trace if event["name"] == "sleep"}
+    assert sleeps[2]["dur"] == 1e6
+    assert sleeps[1]["dur"] < 0.5e6
+    assert sleeps[2]["ts"] >= 60e6
+
+
+def test_trace_ring_buffer(tmp_path):
+    path = tmp_path / "trace.json"
+
+    with Timeline(trace=str(path), trace_size=3) as timeline:
+        for _ in range(10):
+            timeline.forward(1)
+    trace = json.loads(path.read_text())["traceEvents"]
+    names = [event["name"] for event in trace if event["ph"] != "M"]
+    assert names == ["forward", "forward"] * 2 + ["exit"] * 2
+
+
+@pytest.mark.skipif(sys.version_info >= (3, 12), reason="requires python < 3.12")
+def test_detect_unpatched_unsupported():
+    with pytest.raises(NotImplementedError):
+        Timeline(detect_unpatched=True)
+
+
+@pytest.mark.skipif(sys.version_info < (3, 12), reason="requires sys.monitoring")
+def test_detect_unpatched():
+    class Cached:
+        clock = time.monotonic
+
+    timeline = Timeline(scale=100, detect_unpatched=True)
+
+    with timeline:
+        time_time()
+        line = inspect.currentframe().f_lineno - 1
+        Cached.clock()
+        time.time()
+        datetime.now()
+    assert timeline.detector.tool_id is None
+    calls = {
+        (call.lineno, call.clock): count
+        for call, count in timeline.detector.calls.items()
+    }
+    assert calls == {(line, "time.time"): 1, (line + 2, "time.monotonic"): 1}
+
+
+@pytest.mark.skipif(sys.version_info < (3, 12), reason="requires sys.monitoring")
+def test_detect_unpatched_call_sites_restarted():
+    def _read(clock):
+        return clock()
+
+    def _detected(**kwargs):
+        timeline = Timeline(detect_unpatched=True, **kwargs)
+
+        with timeline:
+            _read(time_time)
+
+        return [call.clock for call in timeline.detector.calls]
+
+    # disables the call site in _read
+    with Timeline(detect_unpatched=True):
+        _read(dict)
+    assert _detected() == ["time.time"]
+    assert _detected(exclude=[__name__]) == []
+    assert _detected() == ["time.time"]
+
+
+def test_scan_modes():
+    from tests.emulated_modules import aliases
+
+    # aliases in this module are patched as well by the identity scans
+    real_time = time.time
+
+    with Timeline().forward(3600):
+        assert aliases.now() - real_time() < 1
+        assert aliases.Clock.read() - real_time() < 1
+
+    with Timeline(scan_mode="identity").forward(3600):
+        assert aliases.now() - real_time() > 3599
+        assert abs(aliases.dt.now() - datetime.now()) < timedelta(seconds=1)
+        assert aliases.read() - real_time() < 1
+
+    with Timeline(scan_mode="deep").forward(3600):
+        assert aliases.Clock.read() - real_time() > 3599
+        assert aliases.read() - real_time() > 3599
+        assert aliases.scheduler.timefunc() - real_time() > 3599
+    assert aliases.now is real_time
+    assert aliases.Clock.read is real_time
+    assert aliases.read.__defaults__ == (real_time,)
+    assert aliases.read.__kwdefaults__ == {"sleep": time.sleep}
+    assert aliases.scheduler.timefunc is real_time
+
+
+def test_deep_scan_partial():
+    from tests.emulated_modules import aliases
+
+    monotonic = time.monotonic
+
+    with Timeline(scan_mode="deep").forward(3600):
+        assert aliases.stopwatch.func is not monotonic
+        assert aliases.stopwatch() - monotonic() > 3599
+    assert aliases.stopwatch.func is monotonic
+
+
+def test_invalid_scan_mode():
+    with pytest.raises(ValueError):
+        Timeline(scan_mode="fuzzy")
+
+
+def test_overlapping_timelines_exit_out_of_order():
+    from tests.emulated_modules.sub_module_2 import sub_sample_2_1
+
+    real_time, real_datetime = time.time, sub_sample_2_1.datetime
+    first = Timeline().freeze(0)
+    second = Timeline().freeze(3600)
+    first.__enter__()
+    second.__enter__()
+    assert time.time() == 3600
+
+    first.__exit__(None, None, None)
+    assert time.time() == 3600
+    assert sub_sample_2_1.datetime is not real_datetime
+
+    second.__exit__(None, None, None)
+    assert time.time is real_time
+    assert sub_sample_2_1.datetime is real_datetime
+
+
+def test_timelines_entered_concurrently():
+    from tests.emulated_modules.sub_module_2 import sub_sample_2_1
+
+    real_time, real_datetime = time.time, sub_sample_2_1.datetime
+    count = 8
+    entered = threading.Barrier(count)
+    errors = []
+
+    def _run(index):
+        try:
+            with Timeline(scale=index + 1):
+                entered.wait(timeout=10)
+                time.sleep(0.01 * (count - index))
+        except Exception as error:  # pragma: no cover
+            errors.append(error)
+
+    threads = [threading.Thread(target=_run, args=(i,)) for i in range(count)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert time.time is real_time
+    assert sub_sample_2_1.datetime is real_datetime
+    assert hiro.core._PATCHES.sites == {}
@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+import hiro
+from hiro.measurement import Distribution
+
+
+def test_measure():
+    calls = []
+
+    def _slow_func():
+        calls.append(1)
+        time.sleep(len(calls) % 3)
+        if len(calls) == 12:
+            raise Exception("foo")
+
+    stats = hiro.measure(100, _slow_func, repeat=30, warmup=5)
+    assert len(calls) == 35
+    assert len(stats.real) == len(stats.virtual) == 30
+    assert stats.errors == 1
+    assert stats.virtual.min < 0.5
+    assert 1.9 < stats.virtual.max < 4
+    assert stats.virtual.p50 >= 0.9
+    assert stats.real.max < 0.5
+    assert sum(count for _, _, count in stats.virtual.histogram()) == 30
+
+
+def test_distribution():
+    distribution = Distribution()
+    for value in range(1, 101):
+        distribution.add(value / 1000.0)
+    assert distribution.min == 0.001
+    assert distribution.max == 0.1
+    assert distribution.mean == pytest.approx(0.0505)
+    assert distribution.p50 == 0.05
+    assert distribution.p95 == 0.095
+    assert distribution.p99 == 0.099
+    for lower, upper, count in distribution.histogram():
+        assert lower < upper
+        assert count
+    assert distribution.summary()["count"] == 100
+    assert Distribution.bucket(0) == 0
+    lower, upper = Distribution.bucket_bounds(Distribution.bucket(1.0))
+    assert lower <= 1.0 < upper
+
+
+def _polling_workload():
+    # polls every 10 ms: the virtual runtime diverges once scaled sleeps
+    # drop below what the os can deliver
+    start = time.time()
+    polls = 0
+    while time.time() - start < 1:
+        time.sleep(0.01)
+        polls += 1
+    return polls > 0
+
+
+def test_sweep():
+    result = hiro.sweep(
+        _polling_workload, [100, 10, 10**9], reference_factor=10, tolerance=0.5
+    )
+    assert result.reference.response is True
+    assert result.equivalent[10]
+    assert not result.equivalent[10**9]
+    assert result.max_safe_factor in (10, 100)
+
+
+def test_sweep_compare():
+    result = hiro.sweep(
+        _polling_workload,
+        [10, 100],
+        reference_factor=10,
+        compare=lambda reference, segment: segment.response,
+    )
+    assert result.max_safe_factor == 100
@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+from hiro import Timeline
+from hiro.propagation import ENVIRON_KEY, dumps, loads
+
+
+def _get_time():
+    return time.time()
+
+
+def test_dumps_loads():
+    timeline = Timeline(scale=10, exclude=["foo"], factors={"bar": 2}).forward(60)
+    copy = loads(dumps(timeline))
+    assert copy._get_state() == timeline._get_state()
+    assert copy.rules.lookup("bar.baz") == 2
+
+
+def test_propagate_to_subprocess():
+    with Timeline(propagate=True).freeze(0) as timeline:
+        timeline.forward(100)
+        output = subprocess.check_output(
+            [sys.executable, "-c", "import time; print(int(time.time()))"]
+        )
+        assert int(output) == 100
+    assert ENVIRON_KEY not in os.environ
+
+
+def test_propagate_to_spawned_worker():
+    context = multiprocessing.get_context("spawn")
+    start = time.time()
+    # the pool is only started within the timeline, since its shutdown
+    # relies on timeouts that would never expire under a frozen clock.
+    with Timeline(propagate=True).forward(3600):
+        pool = context.Pool(1)
+    try:
+        assert pool.apply_async(_get_time).get(timeout=60) - start >= 3600
+    finally:
+        pool.close()
+        pool.join()
+
+
+def test_propagated_child_has_no_errors():
+    with Timeline(propagate=True):
+        child = subprocess.run(
+            [sys.executable, "-c", "import time; time.time()"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+    assert child.returncode == 0
+    assert child.stderr == b""
+
+
+def test_no_propagation():
+    with Timeline().freeze(0):
+        output = subprocess.check_output(
+            [sys.executable, "-c", "import time; print(int(time.time()))"]
+        )
+        assert int(output) > 0
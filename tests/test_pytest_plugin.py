@@ -0,0 +1,138 @@
+import pytest
+
+pytest_plugins = ["pytester"]
+
+
+@pytest.fixture
+def run(pytester, pytestconfig):
+    # once hiro is installed the plugin is loaded through its entry point
+    if pytestconfig.pluginmanager.has_plugin("hiro"):
+        plugin = ()
+    else:
+        plugin = ("-p", "hiro.pytest_plugin")
+
+    def _run(source, *args):
+        pytester.makepyfile(source)
+
+        return pytester.runpytest_inprocess(*plugin, *args)
+
+    return _run
+
+
+def test_fixture(run):
+    result = run(
+        """
+        import time
+
+        from hiro import Timeline
+
+        def test_forward(timeline):
+            assert isinstance(timeline, Timeline)
+            start = time.time()
+            timeline.forward(3600)
+            assert time.time() - start >= 3600
+
+        def test_reset(timeline):
+            assert timeline.factor == 1
+            assert abs(time.time() - timeline._get_original("time.time")()) < 60
+        """
+    )
+    result.assert_outcomes(passed=2)
+
+
+def test_marker(run):
+    result = run(
+        """
+        import datetime
+        import time
+
+        import pytest
+
+        @pytest.mark.timeline(scale=100)
+        def test_scaled(timeline):
+            start = time.time()
+            time.sleep(10)
+            assert timeline.factor == 100
+            assert time.time() - start >= 10
+
+        @pytest.mark.timeline(start=datetime.datetime(2012, 12, 12), frozen=True)
+        def test_frozen_without_fixture():
+            assert datetime.date.today() == datetime.date(2012, 12, 12)
+            now = time.time()
+            time.sleep(0.1)
+            assert time.time() == now
+
+        @pytest.mark.timeline(start=datetime.datetime(2012, 12, 12))
+        def test_start():
+            assert datetime.date.today() == datetime.date(2012, 12, 12)
+
+        def test_unmarked():
+            assert datetime.date.today() > datetime.date(2012, 12, 12)
+        """,
+        "--durations=0",
+    )
+    result.assert_outcomes(passed=4)
+    # the scaled sleep must not be slept in real time
+    assert "10.0" not in result.stdout.str()
+
+
+def test_decorated_test_with_timeline_argument(run):
+    result = run(
+        """
+        from hiro import Timeline
+
+        @Timeline(scale=10)
+        def test_decorated(timeline):
+            assert timeline.factor == 10
+        """
+    )
+    result.assert_outcomes(passed=1)
+
+
+def test_patch_sites_are_reused(run):
+    result = run(
+        """
+        from unittest import mock
+
+        from hiro import Timeline
+
+        def test_first(timeline):
+            pass
+
+        def test_second(timeline):
+            with mock.patch("hiro.core.dir", create=True, side_effect=dir) as scan:
+                with Timeline(sites=timeline.sites):
+                    pass
+            assert scan.call_count == 0
+        """
+    )
+    result.assert_outcomes(passed=2)
+
+
+def test_report(run):
+    result = run(
+        """
+        import time
+
+        import pytest
+
+        @pytest.mark.timeline(scale=100)
+        def test_sleep():
+            time.time()
+            time.sleep(10)
+
+        def test_without_timeline():
+            pass
+        """,
+        "--hiro-report",
+    )
+    result.assert_outcomes(passed=2)
+    result.stdout.re_match_lines(
+        [
+            ".*hiro report.*",
+            r"enter \(ms\) +exit \(ms\) +sites +reads +sleep saved \(s\) +test",
+            r" +[\d.]+ +[\d.]+ +\d+ +\d+ +9\.\d+  test_report.py::test_sleep",
+            "1 tests used a timeline:.*",
+        ]
+    )
+    assert "test_without_timeline" not in result.stdout.str()
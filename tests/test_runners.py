@@ -1,7 +1,10 @@
 """
 
 """
+import asyncio
+import concurrent.futures
 import time
+from unittest import mock
 
 import pytest
 
@@ -68,3 +71,237 @@ def test_segment_not_complete_error():
     with pytest.raises(Exception):
         f.get_response()
     assert f.get_execution_time() < 1
+
+
+def test_batch_runner():
+    def _slow_func(value):
+        time.sleep(1)
+        return value
+
+    def _fail():
+        raise Exception("foo")
+
+    with mock.patch.object(
+        hiro.core._Patch, "start", autospec=True, side_effect=hiro.core._Patch.start
+    ) as patch:
+        calls = [(_slow_func, (i,)) for i in range(5)]
+        calls += [_fail, (_slow_func, (), {"value": 5})]
+        segments = hiro.run_batch(10, calls)
+        installed = patch.call_count
+        hiro.run_sync(10, _slow_func, 1)
+        assert installed > 0
+        assert patch.call_count - installed == installed
+
+    assert [s.response for s in segments[:5]] == list(range(5))
+    with pytest.raises(Exception):
+        segments[5].response
+    assert segments[6].response == 5
+    assert all(segment.runtime < 1 for segment in segments)
+
+
+def test_timeline_executor():
+    def _slow_func(value):
+        time.sleep(10)
+        if value == 3:
+            raise ValueError(value)
+        return value
+
+    start = time.time()
+    with hiro.TimelineExecutor(100, max_workers=4) as executor:
+        futures = [executor.submit(_slow_func, i) for i in range(8)]
+        done = list(concurrent.futures.as_completed(futures))
+        assert len(done) == 8
+        _, pending = concurrent.futures.wait(futures)
+        assert not pending
+
+    assert time.time() - start < 5
+    assert [f.result() for f in futures if f is not futures[3]] == [
+        0,
+        1,
+        2,
+        4,
+        5,
+        6,
+        7,
+    ]
+    with pytest.raises(ValueError):
+        futures[3].result()
+    for future in futures:
+        assert future.get_execution_time() < 1
+        assert future.get_virtual_time() >= 10
+
+
+def test_timeline_executor_not_complete():
+    executor = hiro.TimelineExecutor(1, max_workers=1)
+    try:
+        future = executor.submit(time.sleep, 0.5)
+        with pytest.raises(SegmentNotComplete):
+            future.get_virtual_time()
+    finally:
+        executor.shutdown()
+    assert future.get_virtual_time() >= 0.5
+
+
+def _cpu_bound(value):
+    time.sleep(10)
+    if value < 0:
+        raise ValueError(value)
+    return sum(range(value))
+
+
+def test_process_runner():
+    f = hiro.run_process(100, _cpu_bound, 1000)
+    assert f.get_response() == sum(range(1000))
+    assert f.get_execution_time() < 5
+    assert f.get_virtual_time() >= 10
+
+    f = hiro.run_process(100, _cpu_bound, -1)
+    with pytest.raises(ValueError):
+        f.get_response()
+
+
+def test_process_runner_unpicklable():
+    f = hiro.run_process(10, lambda: 1)
+    assert f.get_execution_time() < 5
+    with pytest.raises(Exception) as exc_info:
+        f.get_response()
+    assert not isinstance(exc_info.value, SegmentNotComplete)
+
+
+def test_process_executor():
+    with hiro.TimelineProcessExecutor(100, max_workers=2) as executor:
+        futures = [executor.submit(_cpu_bound, i) for i in range(-1, 4)]
+        _, pending = concurrent.futures.wait(futures)
+        assert not pending
+    with pytest.raises(ValueError):
+        futures[0].result()
+    assert [f.result() for f in futures[1:]] == [0, 0, 1, 3]
+    assert all(f.get_virtual_time() >= 10 for f in futures)
+
+
+async def _slow_coroutine(value):
+    await asyncio.sleep(10)
+    time.sleep(10)
+    if value < 0:
+        raise ValueError(value)
+    return value
+
+
+def test_coroutine_runner():
+    f = hiro.run_coroutine(100, _slow_coroutine, 1)
+    assert f.get_response() == 1
+    assert f.get_execution_time() < 1
+    assert f.get_virtual_time() >= 20
+
+    f = hiro.run_coroutine(100, _slow_coroutine, -1)
+    with pytest.raises(ValueError):
+        f.get_response()
+
+
+def test_gather_runner():
+    start = time.time()
+    segments = hiro.run_gather(100, [(_slow_coroutine, (i,)) for i in range(-1, 10)])
+    assert time.time() - start < 5
+    with pytest.raises(ValueError):
+        segments[0].response
+    assert [s.response for s in segments[1:]] == list(range(10))
+
+
+def test_stream_runner():
+    def _poll(count):
+        for i in range(count):
+            time.sleep(60)
+            yield i, time.time()
+
+    real_time = time.time
+    start = time.time()
+    items = []
+    for item in hiro.run_stream(6000, _poll, 5):
+        # the consumer runs on the real clock
+        assert time.time is real_time
+        items.append(item)
+    assert time.time() - start < 1
+    assert [item.value[0] for item in items] == list(range(5))
+    assert all(item.virtual_time - start >= 60 for item in items)
+    assert all(0 <= item.virtual_time - item.value[1] < 60 for item in items)
+    assert all(item.real_time - start < 1 for item in items)
+
+
+def test_stream_runner_early_exit():
+    closed = []
+
+    def _infinite():
+        try:
+            while True:
+                yield time.time()
+        finally:
+            closed.append(True)
+
+    stream = hiro.run_stream(10, _infinite)
+    next(stream)
+    stream.close()
+    assert closed
+
+
+def test_stream_runner_scans_once():
+    def _count(count):
+        yield from range(count)
+
+    scan = hiro.core.PatchSites._PatchSites__scan_module
+
+    with mock.patch.object(
+        hiro.core.PatchSites, "_PatchSites__scan_module", autospec=True, side_effect=scan
+    ) as patch:
+        items = list(hiro.run_stream(10, _count, 5))
+    assert [item.value for item in items] == list(range(5))
+    scanned = [call.args[1] for call in patch.call_args_list]
+    assert scanned
+    # the timeline is entered once per item but every module is scanned once
+    assert len(scanned) == len(set(scanned))
+
+
+def test_segment_timings():
+    def _busy_func():
+        time.sleep(100)
+        start = time.process_time()
+        while time.process_time() - start < 0.05:
+            pass
+        return 1
+
+    f = hiro.run_sync(1000, _busy_func)
+    assert f.get_response() == 1
+    assert f.get_execution_time() < 1
+    assert f.get_virtual_time() >= 100
+    assert f.get_cpu_time() >= 0.05
+    assert not hasattr(f.segment, "__dict__")
+
+
+def test_segment_error_without_traceback():
+    def _fail():
+        raise ValueError("foo")
+
+    f = hiro.run_sync(1, _fail)
+    with pytest.raises(ValueError, match="foo") as exc_info:
+        f.get_response()
+    # the frames of the failed call are not kept alive
+    assert "_fail" not in [entry.name for entry in exc_info.traceback]
+
+
+def _chained_failure():
+    try:
+        {}["foo"]
+    except KeyError:
+        raise ValueError("foo")
+
+
+def test_segment_error_leaves_exception_intact():
+    with hiro.TimelineExecutor(10) as executor:
+        future = executor.submit(_chained_failure)
+        error = future.exception()
+    assert error.__traceback__ is not None
+    assert isinstance(error.__context__, KeyError)
+    with pytest.raises(ValueError) as exc_info:
+        future.segment.response
+    assert exc_info.value is not error
+    assert exc_info.value.__context__ is None
+    assert exc_info.value.__cause__ is None
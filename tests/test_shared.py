@@ -0,0 +1,110 @@
+import os
+import struct
+import time
+
+import pytest
+
+from hiro import SharedTimeline
+from hiro.errors import SharedTimelineError
+
+
+def test_shared_state(tmp_path):
+    path = str(tmp_path / "timeline")
+    timeline = SharedTimeline(scale=10, path=path)
+    attached = SharedTimeline.attach(path)
+    try:
+        assert attached.factor == 10
+        assert attached.freeze_point is None
+
+        timeline.freeze(0).forward(3600)
+        assert attached.freeze_point == 0
+        assert attached.offset == 3600
+
+        with attached:
+            assert int(time.time()) == 3600
+            timeline.unfreeze().scale(1000)
+            time.sleep(1)
+            assert 1 <= time.time() < 60
+    finally:
+        timeline.close()
+        attached.close()
+
+
+def test_attach_uninitialized(tmp_path):
+    path = tmp_path / "timeline"
+
+    with pytest.raises(FileNotFoundError):
+        SharedTimeline.attach(str(path))
+    assert not path.exists()
+
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(SharedTimelineError):
+        SharedTimeline.attach(str(path))
+
+
+def test_reject_zero_factor(tmp_path):
+    with pytest.raises(ValueError):
+        SharedTimeline(scale=0)
+
+
+def test_reader_gives_up_on_incomplete_update(tmp_path):
+    path = str(tmp_path / "timeline")
+    timeline = SharedTimeline(path=path)
+    attached = SharedTimeline.attach(path)
+    try:
+        # emulate a writer that died in the middle of an update
+        with open(path, "r+b") as segment:
+            segment.seek(16)
+            segment.write(struct.pack("=Q", 1))
+        with pytest.raises(SharedTimelineError):
+            attached.factor
+    finally:
+        timeline.close()
+        attached.close()
+
+
+def test_shared_decorated():
+    timeline = SharedTimeline(scale=100)
+
+    @timeline
+    def _slow():
+        time.sleep(10)
+
+    try:
+        start = time.time()
+        _slow()
+        assert time.time() - start < 10
+    finally:
+        timeline.close()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_shared_with_forked_process():
+    timeline = SharedTimeline()
+    ready_read, ready_write = os.pipe()
+    result_read, result_write = os.pipe()
+    try:
+        pid = os.fork()
+
+        if pid == 0:  # pragma: no cover
+            code = 1
+            try:
+                with timeline:
+                    os.read(ready_read, 1)
+                    os.write(result_write, str(int(time.time())).encode())
+                    try:
+                        timeline.forward(1)
+                    except SharedTimelineError:
+                        code = 0
+            finally:
+                os._exit(code)
+        timeline.freeze(0).forward(1234)
+        os.write(ready_write, b"1")
+        assert int(os.read(result_read, 64)) == 1234
+        assert os.waitpid(pid, 0)[1] == 0
+        assert timeline.offset == 1234
+    finally:
+        timeline.close()
+
+        for fd in (ready_read, ready_write, result_read, result_write):
+            os.close(fd)
@@ -1,10 +1,19 @@
 import datetime
+import gc
 import time
+import types
 
 import pytest
 
 from hiro.errors import InvalidTypeError
-from hiro.utils import chained, time_in_seconds, timedelta_to_seconds, utc
+from hiro.rules import DEFAULT, EXCLUDED, IgnoredModules, ModuleRules
+from hiro.utils import (
+    chained,
+    minimum_sleep,
+    time_in_seconds,
+    timedelta_to_seconds,
+    utc,
+)
 
 
 def test_fractional():
@@ -67,3 +76,75 @@ class TestChained:
     def test_kwargs(self):
         o = object()
         assert self.obj.return_value(value=o) is o
+
+
+class TestModuleRules:
+    def test_no_rules(self):
+        assert ModuleRules.from_config() is None
+
+    def test_most_specific(self):
+        rules = ModuleRules.from_config(factors={"a": 10, "a.b": 100})
+        assert rules.lookup("a") == 10
+        assert rules.lookup("a.c") == 10
+        assert rules.lookup("a.b.c") == 100
+        assert rules.lookup("ab") is DEFAULT
+
+    def test_exclude_subtree(self):
+        rules = ModuleRules.from_config(exclude=["a"], factors={"a.b": 100})
+        assert rules.lookup("a.b.c") is EXCLUDED
+        assert rules.lookup("b") is DEFAULT
+
+    def test_include(self):
+        rules = ModuleRules.from_config(include=["a"], exclude=["a.b"])
+        assert rules.lookup("a.c") is DEFAULT
+        assert rules.lookup("a.b") is EXCLUDED
+        assert rules.lookup("b") is EXCLUDED
+
+    def test_list_rules(self):
+        rules = ModuleRules.from_config(exclude=["a.b"], factors={"a": 10})
+        assert rules.rules() == [("a", 10), ("a.b", EXCLUDED)]
+
+
+class TestIgnoredModules:
+    def test_weak_reference(self):
+        ignored = IgnoredModules()
+        module = types.ModuleType("plugin")
+        ignored.add(module, "reloaded")
+        assert module in ignored
+        assert ignored.reason(module) == "reloaded"
+        assert ignored.entries() == [("plugin", "reloaded")]
+
+        del module
+        gc.collect()
+        assert len(ignored) == 0
+        assert ignored.entries() == []
+
+    def test_not_weak_referenceable(self):
+        ignored = IgnoredModules()
+        ignored.add(None)
+        assert None in ignored
+        assert len(ignored) == 1
+
+    def test_prefix(self):
+        ignored = IgnoredModules()
+        ignored.add_prefix("plugins", "third party")
+        module = types.ModuleType("plugins.foo")
+        assert ignored.reason(module, "plugins.foo") == "third party"
+        assert ignored.reason(module, "pluginsfoo") is None
+        assert module not in ignored
+        assert ignored.entries() == [("plugins.*", "third party")]
+
+    def test_clear(self):
+        ignored = IgnoredModules()
+        module = types.ModuleType("plugin")
+        ignored.add(module)
+        ignored.add_prefix("plugins")
+        ignored.clear()
+        assert module not in ignored
+        assert ignored.reason(module, "plugins.foo") is None
+        assert ignored.entries() == []
+
+
+def test_minimum_sleep():
+    assert 0 < minimum_sleep() < 0.1
+    assert minimum_sleep() == minimum_sleep()